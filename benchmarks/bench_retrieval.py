@@ -0,0 +1,298 @@
+"""
+Retrieval and ingestion micro-benchmarks.
+
+Measures the vector path in src/data: PDF parse throughput, chunks embedded
+per second, FAISS index build/save/load time, per-query latency at increasing
+corpus sizes, recall@k against an exact brute-force baseline, BM25 build and
+search time, first-hit rate on SKU lookups (dense only vs hybrid) and peak RSS.
+Each run is appended to a JSON-lines history file and compared with the last
+run of the same configuration so regressions stand out.
+
+Runs offline against a locally cached embedding model:
+
+    EMBEDDING_CACHE_DIR=./instance/models python -m benchmarks.bench_retrieval --download   # once, online
+    HF_HUB_OFFLINE=1 EMBEDDING_CACHE_DIR=./instance/models python -m benchmarks.bench_retrieval
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from loadtest.corpus import generate_corpus
+from src.config.settings import EMBEDDING_BACKEND, EMBEDDING_THREADS, RETRIEVAL_CANDIDATES, RETRIEVAL_K
+from src.data.embeddings import get_embeddings, hybrid_search
+from src.data.lexical import LexicalIndex, Segment
+from src.data.loader import load_book_documents
+
+HISTORY_FILE = os.path.join(os.path.dirname(__file__), "history.jsonl")
+REGRESSION_THRESHOLD = 0.10
+
+# Lower is better for these; everything else in "results" is higher-is-better or informational
+LOWER_IS_BETTER = ("seconds", "latency", "rss")
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _latency_stats(samples: List[float]) -> Dict[str, float]:
+    ms = np.array(samples) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)), "mean_ms": float(ms.mean())}
+
+
+def bench_parse(paths: List[str]) -> Dict:
+    start = time.perf_counter()
+    docs = []
+    for i, path in enumerate(paths):
+        docs.extend(load_book_documents(path, i + 1, os.path.basename(path)))
+    seconds = time.perf_counter() - start
+    megabytes = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+    return {
+        "docs": docs,
+        "parse_seconds": seconds,
+        "parse_pages_per_second": len(docs) / seconds,
+        "parse_mb_per_second": megabytes / seconds,
+    }
+
+
+def bench_embed(embeddings, texts: List[str]) -> Dict:
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    seconds = time.perf_counter() - start
+    return {"vectors": np.array(vectors, dtype="float32"), "embed_seconds": seconds, "embed_chunks_per_second": len(texts) / seconds}
+
+
+def scaled_vectors(base: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Tile the real vectors up to `size` rows, jittered so duplicates do not tie."""
+    reps = -(-size // len(base))
+    tiled = np.tile(base, (reps, 1))[:size]
+    if size > len(base):
+        tiled = tiled + rng.normal(0, 0.01, tiled.shape).astype("float32")
+    return tiled
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    # Squared L2, same metric as the IndexFlatL2 LangChain builds by default
+    distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def bench_index(embeddings, texts: List[str], vectors: np.ndarray, queries: List[str], query_vectors: np.ndarray,
+                size: int, k: int, rng: np.random.Generator) -> Dict:
+    sized = scaled_vectors(vectors, size, rng)
+    sized_texts = [texts[i % len(texts)] for i in range(size)]
+    metadatas = [{"book_id": 1, "row": i} for i in range(size)]
+
+    start = time.perf_counter()
+    store = FAISS.from_embeddings(list(zip(sized_texts, sized.tolist())), embeddings, metadatas=metadatas)
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        store.save_local(tmp)
+        save_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        store = FAISS.load_local(tmp, embeddings=embeddings, allow_dangerous_deserialization=True)
+        load_seconds = time.perf_counter() - start
+
+    search_latencies = []
+    hits = []
+    for query_vector in query_vectors:
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(query_vector.tolist(), k=k)
+        search_latencies.append(time.perf_counter() - start)
+        hits.append([doc.metadata["row"] for doc in docs])
+
+    end_to_end = []
+    for query in queries:
+        start = time.perf_counter()
+        store.similarity_search(query, k=k)
+        end_to_end.append(time.perf_counter() - start)
+
+    exact = exact_top_k(sized, query_vectors, k)
+    recall = float(np.mean([len(set(h) & set(e)) / k for h, e in zip(hits, exact.tolist())]))
+
+    return {
+        "size": size,
+        "build_seconds": build_seconds,
+        "save_seconds": save_seconds,
+        "load_seconds": load_seconds,
+        "search_latency": _latency_stats(search_latencies),
+        "query_latency": _latency_stats(end_to_end),
+        f"recall_at_{k}": recall,
+    }
+
+
+def bench_hybrid(embeddings, docs, vectors: np.ndarray, queries: int) -> Dict:
+    """BM25 cost, and how often the top hit for "<SKU>" questions is the page quoting it."""
+    ids = [f"doc-{i}" for i in range(len(docs))]
+    by_book = defaultdict(list)
+    for doc_id, doc in zip(ids, docs):
+        by_book[doc.metadata["book_id"]].append((doc_id, doc.page_content))
+
+    start = time.perf_counter()
+    lexical = LexicalIndex(Segment(book_id, "bench", *zip(*pages)) for book_id, pages in by_book.items())
+    build_seconds = time.perf_counter() - start
+
+    store = FAISS.from_embeddings(
+        list(zip([doc.page_content for doc in docs], vectors.tolist())), embeddings,
+        metadatas=[doc.metadata for doc in docs], ids=ids,
+    )
+    pages_by_sku = defaultdict(set)
+    for doc_id, doc in zip(ids, docs):
+        for sku in re.findall(r"SKU-\d{5}", doc.page_content):
+            pages_by_sku[sku].add(doc_id)
+    lookups = [(sku, pages.pop()) for sku, pages in sorted(pages_by_sku.items()) if len(pages) == 1][:queries]
+
+    latencies = []
+    hits = Counter()
+    for sku, expected in lookups:
+        query = f"My order {sku} stopped working, what should I do?"
+        start = time.perf_counter()
+        lexical.search(query, k=RETRIEVAL_CANDIDATES)
+        latencies.append(time.perf_counter() - start)
+        hits["dense"] += store.similarity_search(query, k=1)[0].id == expected
+        hits["hybrid"] += hybrid_search(store, lexical, query, k=1)[0][0].id == expected
+
+    return {
+        "lexical_build_seconds": build_seconds,
+        "lexical_search_latency": _latency_stats(latencies),
+        "first_hit_rate_dense": hits["dense"] / len(lookups),
+        "first_hit_rate_hybrid": hits["hybrid"] / len(lookups),
+    }
+
+
+def run(args) -> Dict:
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        paths = generate_corpus(corpus_dir, args.books, args.pages, seed=args.seed)
+        parse = bench_parse(paths)
+    docs = parse.pop("docs")
+    texts = [doc.page_content for doc in docs]
+
+    start = time.perf_counter()
+    embeddings = get_embeddings()
+    embeddings.embed_query("warm up")
+    model_load_seconds = time.perf_counter() - start
+
+    embed = bench_embed(embeddings, texts)
+    vectors = embed.pop("vectors")
+
+    queries = [f"How do I reset my router error E{100 + i}?" for i in range(args.queries)]
+    query_vectors = np.array(embeddings.embed_documents(queries), dtype="float32")
+
+    hybrid = bench_hybrid(embeddings, docs, vectors, args.queries)
+    indexes = [bench_index(embeddings, texts, vectors, queries, query_vectors, size, args.k, rng) for size in args.sizes]
+
+    return {
+        "corpus": {"books": args.books, "pages": len(texts)},
+        "model_load_seconds": model_load_seconds,
+        **parse,
+        **embed,
+        "hybrid": hybrid,
+        "indexes": indexes,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, list):
+            for item in value:
+                flat.update(_flatten(item, f"{prefix}{key}[{item.get('size')}]."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def find_regressions(current: Dict, previous: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    regressions = []
+    old = _flatten(previous)
+    for key, new_value in _flatten(current).items():
+        old_value = old.get(key)
+        if not old_value or key.endswith((".size", ".pages", ".books")):
+            continue
+        change = (new_value - old_value) / old_value
+        lower_is_better = any(marker in key for marker in LOWER_IS_BETTER)
+        if (change > threshold) if lower_is_better else (change < -threshold):
+            regressions.append(f"{key}: {old_value:.4g} -> {new_value:.4g} ({change:+.0%})")
+    return regressions
+
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF ingestion, embedding and FAISS retrieval.")
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Index sizes, in chunks")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=RETRIEVAL_K, help="Chunks per query (default: RETRIEVAL_K)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--no-history", action="store_true", help="Do not append this run to the history file")
+    parser.add_argument("--download", action="store_true", help="Only fetch the embedding model into the cache")
+    args = parser.parse_args()
+
+    if args.download:
+        get_embeddings().embed_query("download")
+        print("Embedding model cached")
+        return
+
+    config = {k: getattr(args, k) for k in ("books", "pages", "sizes", "queries", "k", "seed")}
+    # Runs are only compared against earlier runs of the same backend
+    config["embedding_backend"] = EMBEDDING_BACKEND
+    config["embedding_threads"] = EMBEDDING_THREADS
+    entry = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": config,
+        "results": run(args),
+    }
+
+    previous = [e for e in load_history(args.history) if e.get("config") == config]
+    if previous:
+        entry["compared_to"] = previous[-1]["commit"]
+        entry["regressions"] = find_regressions(entry["results"], previous[-1]["results"])
+
+    if not args.no_history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    print(json.dumps(entry, indent=2))
+    if entry.get("regressions"):
+        print(f"{len(entry['regressions'])} metric(s) regressed by more than {REGRESSION_THRESHOLD:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
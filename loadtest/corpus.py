@@ -0,0 +1,134 @@
+"""
+Synthetic PDF corpus for load tests and benchmarks.
+
+Writes small text-only PDFs directly (no PDF library needed) filled with
+deterministic FAQ-style paragraphs, including product codes and error numbers
+so lexical lookups have something to hit.
+
+    python -m loadtest.corpus --out ./instance/loadtest_corpus --books 5 --pages 20
+"""
+
+import argparse
+import os
+import random
+from typing import List
+
+SUBJECTS = ["router", "thermostat", "camera", "speaker", "charger", "printer", "doorbell", "sensor"]
+ACTIONS = ["reset", "pair", "update", "mount", "clean", "register", "calibrate", "replace"]
+DETAILS = [
+    "hold the power button for ten seconds until the light blinks",
+    "open the companion app and choose the device from the list",
+    "make sure the firmware is on the latest release before continuing",
+    "unplug the unit, wait thirty seconds and plug it back in",
+    "contact support with your order number if the issue persists",
+    "check that the battery is charged above twenty percent",
+    "confirm the network uses the 2.4 GHz band",
+    "remove the protective film before installing the unit",
+]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def faq_paragraph(rng: random.Random) -> str:
+    subject = rng.choice(SUBJECTS)
+    action = rng.choice(ACTIONS)
+    sku = f"SKU-{rng.randint(10000, 99999)}"
+    error = f"E{rng.randint(100, 999)}"
+    return (
+        f"Q: How do I {action} my {subject} ({sku})? "
+        f"A: To {action} the {subject}, {rng.choice(DETAILS)}. "
+        f"If the display shows error {error}, {rng.choice(DETAILS)}."
+    )
+
+
+def page_lines(rng: random.Random, paragraphs: int, width: int = 90) -> List[str]:
+    lines = []
+    for _ in range(paragraphs):
+        words = faq_paragraph(rng).split()
+        line = ""
+        for word in words:
+            if len(line) + len(word) + 1 > width:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}".strip()
+        lines.append(line)
+        lines.append("")
+    return lines
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """Write a minimal PDF with one Helvetica text block per page."""
+    objects = []
+    page_ids = []
+    font_id = 3
+    next_id = 4
+    page_objects = []
+    for lines in pages:
+        text_ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        for line in lines:
+            text_ops.append(f"({_escape(line)}) Tj T*")
+        text_ops.append("ET")
+        stream = "\n".join(text_ops).encode("latin-1")
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        page_objects.append((content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+        page_objects.append((page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()))
+
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append((1, b"<< /Type /Catalog /Pages 2 0 R >>"))
+    objects.append((2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()))
+    objects.append((font_id, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+    objects.extend(page_objects)
+    objects.sort()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in objects:
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n" % (len(objects) + 1)
+    out += b"0000000000 65535 f \n"
+    for obj_id in range(1, len(objects) + 1):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(out_dir: str, books: int = 5, pages: int = 20, paragraphs: int = 8, seed: int = 0,
+                    prefix: str = "synthetic") -> List[str]:
+    """Generate `books` PDFs of `pages` pages each and return their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(books):
+        path = os.path.join(out_dir, f"{prefix}_{seed}_{i:03d}.pdf")
+        write_pdf(path, [page_lines(rng, paragraphs) for _ in range(pages)])
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic FAQ PDF corpus.")
+    parser.add_argument("--out", default="./instance/loadtest_corpus")
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=8, help="FAQ paragraphs per page")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.out, args.books, args.pages, args.paragraphs, args.seed)
+    print(f"Wrote {len(paths)} PDFs to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
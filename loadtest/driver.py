@@ -0,0 +1,204 @@
+"""
+Load driver for the chatbot API.
+
+Signs up N users, optionally uploads and activates a synthetic corpus as an
+admin, then runs concurrent multi-turn conversations against /chat and
+reports throughput, latency percentiles and error rates as JSON.
+
+    python -m loadtest.fake_llm --port 9000 &
+    GROQ_API_BASE=http://127.0.0.1:9000 GROQ_API_KEY=fake uvicorn src.interfaces.api:app --workers 4 &
+    python -m loadtest.driver --users 50 --turns 5 --concurrency 20 --corpus-books 5 \\
+        --output loadtest/results/$(git rev-parse --short HEAD).json
+    python -m loadtest.driver ... --compare loadtest/results/<baseline>.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import httpx
+
+from loadtest.corpus import ACTIONS, SUBJECTS, generate_corpus
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, status: int, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.samples.append({"endpoint": endpoint, "status": status, "seconds": seconds, "error": error})
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(samples: List[Dict], duration: float) -> Dict:
+    latencies = [s["seconds"] * 1000 for s in samples]
+    errors = [s for s in samples if s["status"] != 200]
+    by_status: Dict[str, int] = {}
+    for s in errors:
+        key = str(s["status"]) if s["status"] else "transport"
+        by_status[key] = by_status.get(key, 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(samples) if samples else 0.0,
+        "errors_by_status": by_status,
+        "throughput_rps": len(samples) / duration if duration else 0.0,
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else 0.0,
+        },
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def signup(client: httpx.Client, username: str, role: str = "user") -> str:
+    response = client.post("/signup", json={"username": username, "password": "loadtest-password", "role": role})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def upload_corpus(client: httpx.Client, token: str, paths: List[str]):
+    headers = {"Authorization": f"Bearer {token}"}
+    files = [("files", (os.path.basename(p), open(p, "rb"), "application/pdf")) for p in paths]
+    try:
+        response = client.post("/admin/books/upload", files=files, headers=headers, timeout=600)
+        response.raise_for_status()
+    finally:
+        for _, (_, handle, _) in files:
+            handle.close()
+    names = {os.path.basename(p) for p in paths}
+    for book in client.get("/admin/books", headers=headers).json():
+        if book["name"] in names and not book["active"]:
+            client.post("/admin/books/toggle", json={"id": book["id"], "active": True}, headers=headers, timeout=600)
+
+
+def make_question(rng: random.Random) -> str:
+    return f"How do I {rng.choice(ACTIONS)} my {rng.choice(SUBJECTS)}?"
+
+
+def run_conversation(client: httpx.Client, token: str, turns: int, think_time: float, rng: random.Random, recorder: Recorder):
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(turns):
+        start = time.perf_counter()
+        try:
+            response = client.post("/chat", json={"user_input": make_question(rng)}, headers=headers)
+            recorder.record("/chat", response.status_code, time.perf_counter() - start,
+                            None if response.status_code == 200 else response.text[:200])
+        except httpx.HTTPError as e:
+            recorder.record("/chat", 0, time.perf_counter() - start, str(e))
+        if think_time:
+            time.sleep(rng.uniform(0, 2 * think_time))
+
+
+def run(args) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    with httpx.Client(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        run_id = uuid.uuid4().hex[:8]
+        if args.corpus_books:
+            paths = generate_corpus(args.corpus_dir, args.corpus_books, args.corpus_pages,
+                                    seed=args.seed, prefix=f"loadtest_{run_id}")
+            admin_token = signup(client, f"loadtest-admin-{run_id}", role="admin")
+            upload_corpus(client, admin_token, paths)
+
+        tokens = [signup(client, f"loadtest-{run_id}-{i}") for i in range(args.users)]
+        recorder = Recorder()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(run_conversation, client, token, args.turns, args.think_time,
+                            random.Random(args.seed + i), recorder)
+                for i, token in enumerate(tokens)
+            ]
+            for future in futures:
+                future.result()
+        duration = time.perf_counter() - started
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "base_url": args.base_url,
+            "users": args.users,
+            "turns": args.turns,
+            "concurrency": args.concurrency,
+            "think_time": args.think_time,
+            "corpus_books": args.corpus_books,
+            "corpus_pages": args.corpus_pages,
+        },
+        "duration_s": duration,
+        "chat": summarize(recorder.samples, duration),
+        "sample_errors": [s["error"] for s in recorder.samples if s["error"]][:10],
+    }
+    return report
+
+
+def compare(current: Dict, baseline: Dict) -> Dict:
+    """Relative change of the headline numbers versus a previous report."""
+    def delta(new, old):
+        return (new - old) / old if old else None
+    cur, base = current["chat"], baseline["chat"]
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "throughput_rps": delta(cur["throughput_rps"], base["throughput_rps"]),
+        "error_rate": cur["error_rate"] - base["error_rate"],
+        **{f"latency_{k}": delta(cur["latency_ms"][k], base["latency_ms"][k]) for k in ("p50", "p95", "p99")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run concurrent multi-turn conversations against /chat.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3, help="Chat turns per user")
+    parser.add_argument("--concurrency", type=int, default=10, help="Conversations in flight at once")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between turns, seconds")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--corpus-books", type=int, default=0, help="Upload and activate this many synthetic PDFs first")
+    parser.add_argument("--corpus-pages", type=int, default=20)
+    parser.add_argument("--corpus-dir", default="./instance/loadtest_corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Previous JSON report to diff against")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Local stand-in for the Groq / OpenAI chat completions API.
+
+Answers every request after a configurable base latency plus a per-token
+delay, so load tests exercise the full /chat path without live Groq. When the
+request offers `faq_retriever_tool` and the conversation has not called a tool
+yet, it responds with a tool call so retrieval is exercised too.
+
+    python -m loadtest.fake_llm --port 9000 --latency-ms 300 --tokens-per-second 200
+    GROQ_API_BASE=http://127.0.0.1:9000 GROQ_API_KEY=fake uvicorn src.interfaces.api:app
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+RETRIEVAL_TOOL = "faq_retriever_tool"
+
+app = FastAPI(title="Fake LLM")
+app.state.latency_ms = 300.0
+app.state.tokens_per_second = 200.0
+app.state.completion_tokens = 60
+
+
+def _last_user_message(messages: list) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content") or ""
+    return ""
+
+
+def _wants_tool_call(body: dict) -> bool:
+    tool_names = {t.get("function", {}).get("name") for t in body.get("tools") or []}
+    if RETRIEVAL_TOOL not in tool_names:
+        return False
+    messages = body.get("messages", [])
+    for message in reversed(messages):
+        if message.get("role") == "tool":
+            return False
+        if message.get("role") == "user":
+            return True
+    return False
+
+
+def _prompt_tokens(messages: list) -> int:
+    # Same rough 4 chars/token estimate as src.core.memory.trim_history
+    return sum(len(json.dumps(m.get("content") or "")) for m in messages) // 4
+
+
+def _completion_text(query: str, tokens: int) -> str:
+    words = [f"Synthetic answer to '{query[:40]}':"]
+    words.extend(f"word{i}" for i in range(max(tokens - 6, 0)))
+    return " ".join(words)
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> dict:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+async def _think(tokens: int):
+    await asyncio.sleep(app.state.latency_ms / 1000 + tokens / app.state.tokens_per_second)
+
+
+def _chunk(completion_id: str, created: int, model: str, delta: dict, finish_reason=None, **extra) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        **extra,
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "fake")
+    prompt_tokens = _prompt_tokens(messages)
+    query = _last_user_message(messages)
+
+    if _wants_tool_call(body):
+        tokens = 10
+        tool_call = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": RETRIEVAL_TOOL, "arguments": json.dumps({"query": query})},
+        }
+        message = {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+        finish_reason = "tool_calls"
+        pieces = [{"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]}]
+    else:
+        tokens = app.state.completion_tokens
+        text = _completion_text(query, tokens)
+        message = {"role": "assistant", "content": text}
+        finish_reason = "stop"
+        pieces = [{"role": "assistant", "content": word + " "} for word in text.split(" ")]
+    usage = _usage(prompt_tokens, tokens)
+
+    if body.get("stream"):
+        async def stream():
+            await asyncio.sleep(app.state.latency_ms / 1000)
+            for delta in pieces:
+                await asyncio.sleep(1 / app.state.tokens_per_second)
+                yield _chunk(completion_id, created, model, delta)
+            yield _chunk(completion_id, created, model, {}, finish_reason, x_groq={"usage": usage})
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    await _think(tokens)
+    return JSONResponse({
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": usage,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Groq/OpenAI-compatible LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Fixed delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="Tokens per final answer")
+    args = parser.parse_args()
+
+    app.state.latency_ms = args.latency_ms
+    app.state.tokens_per_second = args.tokens_per_second
+    app.state.completion_tokens = args.completion_tokens
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
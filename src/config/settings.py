@@ -6,18 +6,61 @@ load_dotenv()
 
 
 GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
+# Point at an OpenAI/Groq-compatible server instead of api.groq.com (e.g. loadtest.fake_llm)
+GROQ_API_BASE = os.getenv("GROQ_API_BASE")
 MAX_CONTEXT: int = 3
 MODEL_NAME = "openai/gpt-oss-120b"
+# LLM gateway limits, per worker process
+LLM_MAX_IN_FLIGHT: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_MAX_QUEUE: int = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE: float = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX: float = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_REQUEST_TIMEOUT: float = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Local model cache; with HF_HUB_OFFLINE=1 the model is loaded from here without network access
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+# "torch" or "onnx"; the ONNX backend loads EMBEDDING_MODEL_PATH (see src/data/embedding_backends.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")
+# Intra-op threads used for embedding; 0 keeps the library default (all cores)
+EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", "0"))
 # DATA_PATH = "A:\\Projects\\AI Customer Support Chatbot\\data\\sample_docs\\thebook.pdf"
 FAISS_INDEX_PATH = "./src/data/faiss_index"
 BOOKS_UPLOAD_DIR = "./src/data/books/uploads"
+# How often each worker checks the index manifest for a newly published version (seconds)
+INDEX_WATCH_INTERVAL: float = float(os.getenv("INDEX_WATCH_INTERVAL", "1.0"))
+# Hybrid retrieval: chunks returned per query, candidates taken from each of FAISS and BM25, and the RRF constant
+RETRIEVAL_K: int = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_CANDIDATES: int = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+RRF_K: int = int(os.getenv("RRF_K", "60"))
+# Retrieved chunks are packed best first into this many (estimated) prompt tokens; near-duplicates are dropped
+CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_DEDUP_THRESHOLD: float = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
 
 SECRET_KEY = os.getenv("SECRET_KEY", "ayushdevani1718")
 ALGORITHM = "HS256"
 
 DATABASE_URL = "sqlite:///./instance/users.db"
 
+# Chat sessions idle this long are archived to CHAT_ARCHIVE_DIR; archives are deleted after CHAT_RETENTION_DAYS (0 keeps them)
+SESSION_ARCHIVE_AFTER_DAYS: float = float(os.getenv("SESSION_ARCHIVE_AFTER_DAYS", "30"))
+CHAT_RETENTION_DAYS: float = float(os.getenv("CHAT_RETENTION_DAYS", "365"))
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "./instance/chat_archive")
+# Seconds between compaction runs inside the API; 0 disables it (run `python -m src.db.retention` from cron instead)
+CHAT_COMPACTION_INTERVAL: float = float(os.getenv("CHAT_COMPACTION_INTERVAL", "3600"))
+
+# Per-request tracing
+TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL: float = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Honour the "X-Trace: 1" / "X-Profile: 1" request headers; any client can send them, so keep off in production
+TRACE_HEADER_ENABLED: bool = os.getenv("TRACE_HEADER_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACE_DIR = os.getenv("TRACE_DIR", "./instance/traces")
+# Newest traces kept in TRACE_DIR; older ones (and their profiles) are deleted. 0 keeps all
+TRACE_MAX_FILES: int = int(os.getenv("TRACE_MAX_FILES", "500"))
+
 
 
 
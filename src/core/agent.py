@@ -1,9 +1,8 @@
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.agents import create_tool_calling_agent
 from sqlalchemy.orm import Session
 
-from src.config.settings import MODEL_NAME, GROQ_API_KEY
+from src.core.llm_gateway import get_llm
 from src.core.tools import make_faq_retriever_tool, human_handoff_tool
 
 
@@ -12,12 +11,7 @@ def get_agent(db: Session):
 
 
 
-    llm = ChatGroq(
-        model=MODEL_NAME,
-        groq_api_key = GROQ_API_KEY,
-        
-        
-    )
+    llm = get_llm()
 
     tools = [make_faq_retriever_tool(db), human_handoff_tool]
 
@@ -0,0 +1,125 @@
+"""
+Packs retrieved chunks into the context returned by `faq_retriever_tool`.
+
+Chunks arrive with their retrieval scores. Whitespace is collapsed,
+near-duplicates (Jaccard similarity of word shingles at or above
+CONTEXT_DEDUP_THRESHOLD) are dropped, and the rest are added best first until
+CONTEXT_TOKEN_BUDGET is spent. A chunk that does not fit is cut at a sentence
+boundary rather than at a fixed length. Each chunk is labelled with its book,
+resolved from an in-memory id -> name map instead of one query per chunk.
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.config.settings import CONTEXT_DEDUP_THRESHOLD, CONTEXT_TOKEN_BUDGET
+from src.db.models import Book
+from src.utils.logger import setup_logger
+from src.utils.metrics import CACHE_HITS
+from src.utils.tracing import span
+
+logger = setup_logger()
+
+# Same rough estimate as memory.trim_history
+CHARS_PER_TOKEN = 4
+# A partial chunk shorter than this is not worth its label
+MIN_PARTIAL_TOKENS = 40
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s)")
+
+_book_names: Optional[Dict[int, str]] = None
+_book_names_lock = threading.Lock()
+
+
+def refresh_book_names(db: Session) -> Dict[int, str]:
+    """Reload the book id -> name map; called after admins add, toggle or delete books."""
+    global _book_names
+    names = dict(db.query(Book.id, Book.name).all())
+    with _book_names_lock:
+        _book_names = names
+    return names
+
+
+def get_book_names(db: Session, book_ids: Iterable[int]) -> Dict[int, str]:
+    names = _book_names
+    # Another worker may have added a book since this one last loaded the map
+    if names is None or any(book_id not in names for book_id in book_ids):
+        names = refresh_book_names(db)
+    else:
+        CACHE_HITS.inc(cache="book_names")
+    return names
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {tuple(words)}
+    return set(zip(*(words[i:] for i in range(size))))
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut at the last sentence end within `max_chars`, or the last word if there is none."""
+    cut = text[:max_chars]
+    ends = [m.end() for m in _SENTENCE_END.finditer(cut + " ")]
+    if ends and ends[-1] > max_chars // 2:
+        return cut[:ends[-1]]
+    return cut.rsplit(" ", 1)[0] + "..."
+
+
+def pack_context(
+    hits: List[Tuple[str, Optional[int], float]],
+    book_names: Dict[int, str],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+) -> dict:
+    """
+    Build the tool result from (text, book_id, score) hits.
+
+    Returns:
+        dict: 'content' (labelled chunks that fit the budget) and 'used_book_ids'
+        (books of the packed chunks, each once, best first).
+    """
+    with span("context.pack", "tool", hits=len(hits)):
+        kept: List[Tuple[str, Optional[int], set]] = []
+        for text, book_id, _ in sorted(hits, key=lambda hit: hit[2], reverse=True):
+            text = " ".join(text.split())
+            if not text:
+                continue
+            shingles = _shingles(text)
+            if any(_jaccard(shingles, other) >= dedup_threshold for _, _, other in kept):
+                continue
+            kept.append((text, book_id, shingles))
+
+        sections, used_book_ids = [], []
+        remaining = token_budget
+        for text, book_id, _ in kept:
+            label = f"[{book_names.get(book_id, 'Unknown')}]\n"
+            available = remaining - estimate_tokens(label)
+            if estimate_tokens(text) > available:
+                # Always keep part of the best chunk, otherwise only a worthwhile remainder
+                if sections and available < MIN_PARTIAL_TOKENS:
+                    break
+                text = _truncate(text, max(available, 0) * CHARS_PER_TOKEN)
+            sections.append(label + text)
+            remaining -= estimate_tokens(label + text)
+            if book_id is not None and book_id not in used_book_ids:
+                used_book_ids.append(book_id)
+            if remaining <= 0:
+                break
+
+    logger.info(f"Packed {len(sections)} of {len(hits)} chunks ({len(hits) - len(kept)} near-duplicates dropped), "
+                f"~{token_budget - remaining} tokens")
+    if not sections:
+        return {"content": "No relevant information found in the active books.", "used_book_ids": []}
+    return {"content": "\n\n".join(sections), "used_book_ids": used_book_ids}
@@ -3,14 +3,26 @@ from langchain.agents import AgentExecutor
 from src.core.agent import get_agent
 from src.core.tools import human_handoff_tool, make_faq_retriever_tool
 from src.core.memory import AgentState, trim_history
+from src.core.llm_gateway import LLMOverloaded
 from src.db.models import User
 from src.utils.logger import setup_logger
+from src.utils.metrics import GRAPH_NODE_SECONDS, MetricsCallbackHandler
+from src.utils.tracing import span
 from langchain_core.messages import HumanMessage, AIMessage
 from sqlalchemy.orm import Session
-from langchain.callbacks import LangChainTracer
 
 logger = setup_logger()
 
+def retrieved_book_ids(steps) -> list:
+    """Books behind the context faq_retriever_tool returned, in order, each once."""
+    used_book_ids = []
+    for action, observation in steps:
+        if action.tool == "faq_retriever_tool" and isinstance(observation, dict):
+            for book_id in observation.get("used_book_ids", []):
+                if book_id not in used_book_ids:
+                    used_book_ids.append(book_id)
+    return used_book_ids
+
 def agent_node(state: AgentState, db: Session) -> AgentState:
     trimmed_history = trim_history(state.get("chat_history", []))
     agent = get_agent(db)
@@ -18,16 +30,18 @@ def agent_node(state: AgentState, db: Session) -> AgentState:
     executor = AgentExecutor(
         agent=agent,
         tools=[human_handoff_tool, faq_retriever_tool],
-        verbose=True,
-        max_tokens=500
+        verbose=False,
+        max_tokens=500,
+        # The tool's used_book_ids only reach us through the steps, the final result holds just the answer
+        return_intermediate_steps=True
     )
     try:
         result = executor.invoke({
             "input": state["input"],
             "chat_history": trimmed_history
-        })
+        }, config={"callbacks": [MetricsCallbackHandler()]})
         output = result["output"] if isinstance(result, dict) else str(result)
-        used_book_ids = result.get("used_book_ids", [])  # From faq_retriever_tool
+        used_book_ids = retrieved_book_ids(result.get("intermediate_steps", []))
         if isinstance(result, dict) and "faq_retriever_tool" in result:
             faq_result = result["faq_retriever_tool"]
             output = faq_result["content"] if isinstance(faq_result, dict) else faq_result
@@ -42,6 +56,8 @@ def agent_node(state: AgentState, db: Session) -> AgentState:
             "user_id": state["user_id"],
             "used_book_ids": used_book_ids
         }
+    except LLMOverloaded:
+        raise
     except Exception as e:
         logger.error(f"Error in agent_node: {str(e)}")
         full_history = state.get("chat_history", []) + [
@@ -73,10 +89,16 @@ def handoff_node(state: AgentState) -> AgentState:
         "used_book_ids": []
     }
 
+def timed_node(name: str, fn):
+    def node(state: AgentState) -> AgentState:
+        with GRAPH_NODE_SECONDS.time(node=name), span(f"node.{name}", "graph"):
+            return fn(state)
+    return node
+
 def build_graph(db: Session):
     graph = StateGraph(AgentState)
-    graph.add_node("agent", lambda state: agent_node(state, db))
-    graph.add_node("handoff", handoff_node)
+    graph.add_node("agent", timed_node("agent", lambda state: agent_node(state, db)))
+    graph.add_node("handoff", timed_node("handoff", handoff_node))
     graph.set_entry_point("agent")
     graph.add_conditional_edges("agent", should_handoff, {"handoff": "handoff", "end": END})
     graph.add_edge("handoff", END)
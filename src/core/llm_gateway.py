@@ -0,0 +1,262 @@
+"""
+Bounded-concurrency gateway in front of the Groq chat model.
+
+Every LLM call from the agent goes through one `LLMGateway` per worker:
+
+- at most LLM_MAX_IN_FLIGHT upstream calls run at once, over one pooled
+  httpx client;
+- callers beyond that wait in per-user FIFO queues served round-robin, so
+  one busy user cannot starve the others;
+- a caller that cannot get a slot within LLM_QUEUE_TIMEOUT, or arrives when
+  LLM_MAX_QUEUE callers are already waiting, fails fast with LLMOverloaded
+  (HTTP 429) instead of piling onto a saturated provider;
+- identical prompts already in flight are coalesced into one upstream call;
+- rate-limit, timeout and 5xx errors are retried with jittered exponential
+  backoff, capped at LLM_BACKOFF_MAX; a Retry-After longer than that, or
+  than what is left of the call's LLM_REQUEST_TIMEOUT, is shed as
+  LLMOverloaded right away rather than slept through while holding a slot.
+"""
+
+import copy
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+import groq
+import httpx
+from langchain_core.messages import messages_to_dict
+from langchain_groq import ChatGroq
+
+from src.config.settings import (
+    GROQ_API_BASE, GROQ_API_KEY, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_MAX_IN_FLIGHT, LLM_MAX_QUEUE,
+    LLM_MAX_RETRIES, LLM_QUEUE_TIMEOUT, LLM_REQUEST_TIMEOUT, MODEL_NAME,
+)
+from src.utils.logger import setup_logger
+from src.utils.metrics import LLM_COALESCED, LLM_QUEUE_SECONDS, LLM_REJECTED, LLM_RETRIES
+
+logger = setup_logger()
+
+RETRYABLE_ERRORS = (groq.RateLimitError, groq.APITimeoutError, groq.APIConnectionError, groq.InternalServerError)
+
+# Who the current LLM call is for; set per request so queues can be fair per user
+current_llm_user: ContextVar[str] = ContextVar("current_llm_user", default="anonymous")
+
+
+class LLMOverloaded(Exception):
+    """Raised when an LLM call is shed instead of queued or retried further."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE,
+        backoff_max: float = LLM_BACKOFF_MAX,
+        request_timeout: float = LLM_REQUEST_TIMEOUT,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+        self.in_flight = 0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._waiting = 0
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+
+    def call(self, user: str, key: Optional[str], fn: Callable):
+        """Run `fn` under the gateway, sharing the result with identical concurrent calls."""
+        if key is None:
+            return self._run(user, fn)
+        with self._lock:
+            leader = self._calls.get(key)
+            if leader is None:
+                future = self._calls[key] = Future()
+        if leader is not None:
+            LLM_COALESCED.inc()
+            return copy.deepcopy(leader.result())
+        try:
+            result = self._run(user, fn)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _run(self, user: str, fn: Callable):
+        self.acquire(user)
+        try:
+            return self._with_retries(fn)
+        finally:
+            self.release()
+
+    def _with_retries(self, fn: Callable):
+        deadline = time.monotonic() + self.request_timeout
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except RETRYABLE_ERRORS as e:
+                retry_after = _retry_after(e)
+                if attempt >= self.max_retries:
+                    if isinstance(e, groq.RateLimitError):
+                        LLM_REJECTED.inc(reason="upstream_rate_limit")
+                        raise LLMOverloaded("LLM provider rate limit exceeded", retry_after or 1.0) from e
+                    raise
+                # Sleeping holds an in-flight slot, so never wait out a long Retry-After here
+                if retry_after is not None and (
+                    retry_after > self.backoff_max or time.monotonic() + retry_after > deadline
+                ):
+                    LLM_REJECTED.inc(reason="upstream_retry_after")
+                    raise LLMOverloaded("LLM provider asked to retry later", retry_after) from e
+                delay = retry_after if retry_after is not None else random.uniform(
+                    0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                LLM_RETRIES.inc()
+                logger.warning(f"LLM call failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def acquire(self, user: str):
+        start = time.perf_counter()
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiting:
+                self.in_flight += 1
+                LLM_QUEUE_SECONDS.observe(0)
+                return
+            if self._waiting >= self.max_queue:
+                LLM_REJECTED.inc(reason="queue_full")
+                raise LLMOverloaded("Too many requests waiting for the LLM")
+            waiter = _Waiter()
+            self._queues.setdefault(user, deque()).append(waiter)
+            self._waiting += 1
+
+        waiter.event.wait(self.queue_timeout)
+        with self._lock:
+            if not waiter.granted:
+                queue = self._queues.get(user)
+                if queue is not None:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[user]
+                self._waiting -= 1
+                LLM_REJECTED.inc(reason="queue_timeout")
+                raise LLMOverloaded("Timed out waiting for the LLM", self.queue_timeout)
+        LLM_QUEUE_SECONDS.observe(time.perf_counter() - start)
+
+    def release(self):
+        with self._lock:
+            if not self._queues:
+                self.in_flight -= 1
+                return
+            # Hand the slot straight to the next user in round-robin order
+            user, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+            self._waiting -= 1
+            waiter.granted = True
+            waiter.event.set()
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _coalesce_key(model: str, messages, stop, kwargs) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages_to_dict(messages), "stop": stop, "kwargs": kwargs},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class GatewayChatGroq(ChatGroq):
+    """ChatGroq whose calls are queued, coalesced and retried by the worker's LLMGateway."""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = _coalesce_key(self.model_name, messages, stop, kwargs)
+        return get_gateway().call(
+            current_llm_user.get(),
+            key,
+            lambda: super(GatewayChatGroq, self)._generate(messages, stop=stop, run_manager=run_manager, **kwargs),
+        )
+
+
+_gateway: Optional[LLMGateway] = None
+_http_client: Optional[httpx.Client] = None
+_llm: Optional[GatewayChatGroq] = None
+_init_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    with _init_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+    return _gateway
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    with _init_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=LLM_REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=LLM_MAX_IN_FLIGHT, max_keepalive_connections=LLM_MAX_IN_FLIGHT),
+            )
+    return _http_client
+
+
+def get_llm() -> GatewayChatGroq:
+    """Return the worker's shared chat model."""
+    global _llm
+    http_client = get_http_client()
+    with _init_lock:
+        if _llm is None:
+            _llm = GatewayChatGroq(
+                model=MODEL_NAME,
+                groq_api_key=GROQ_API_KEY,
+                base_url=GROQ_API_BASE,
+                http_client=http_client,
+                timeout=LLM_REQUEST_TIMEOUT,
+                # Retries happen in the gateway, where they can be budgeted
+                max_retries=0,
+                # Responses are returned whole, so route everything through _generate
+                disable_streaming=True,
+            )
+    return _llm
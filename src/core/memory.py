@@ -8,6 +8,7 @@ class AgentState(TypedDict):
     chat_history: list[HumanMessage | AIMessage]
     output : str
     user_id: int
+    used_book_ids: list[int]
 
 def trim_history(history: list, max_tokens: int = 8000) -> list:
     """Trim history to fit under max_tokens (rough estimate: 4 chars/token)."""
@@ -1,8 +1,9 @@
 from langchain_core.tools import tool
 from sqlalchemy.orm import Session
+from src.core.context import get_book_names, pack_context
 from src.data.embeddings import get_retriever
 from src.utils.logger import setup_logger
-from src.db.models import Book
+from src.utils.tracing import span
 
 logger = setup_logger()
 
@@ -15,34 +16,27 @@ def make_faq_retriever_tool(db: Session):
             query (str): The search query.
 
         Returns:
-            dict: Contains 'content' (concatenated document content) and 'used_book_ids' (list of book IDs).
+            dict: Contains 'content' (the most relevant passages, each labelled with its book) and 'used_book_ids' (list of book IDs).
         """
-        retriever = get_retriever(db)
-        if not retriever:
-            return {"content": "No active books available for retrieval.", "used_book_ids": []}
-        
-        result = retriever(query)
-        docs = result["results"]
-        used_book_ids = result["used_book_ids"]
-        
-        truncated_docs = [
-            doc[:300] + "..." if len(doc) > 300 else doc
-            for doc in docs
-        ]
-        
-        sources = []
-        for book_id in used_book_ids:
-            book = db.query(Book).filter(Book.id == book_id).first()
-            sources.append(book.name if book else "Unknown")
-        
-        logger.info(f"Retrieved {len(docs)} docs from active books for query: {query}")
-        content = f"From {', '.join(sources)}:\n\n" + "\n\n".join(truncated_docs)
-        return {"content": content, "used_book_ids": used_book_ids}
-    
+        with span("tool.faq_retriever_tool", "tool", query=query):
+            return _retrieve_faq(db, query)
+
     return faq_retriever_tool
 
+def _retrieve_faq(db: Session, query: str) -> dict:
+    retriever = get_retriever(db)
+    if not retriever:
+        return {"content": "No active books available for retrieval.", "used_book_ids": []}
+
+    result = retriever(query)
+    hits = list(zip(result["results"], result["book_ids"], result["scores"]))
+    book_names = get_book_names(db, {book_id for _, book_id, _ in hits if book_id is not None})
+    logger.info(f"Retrieved {len(hits)} docs from active books for query: {query}")
+    return pack_context(hits, book_names)
+
 @tool
 def human_handoff_tool(query: str) -> str:
     """Simulate handing off to a human agent."""
-    logger.info(f"Handing off query: {query}")
-    return "Query escalated to human support. You'll be contacted soon."
\ No newline at end of file
+    with span("tool.human_handoff_tool", "tool"):
+        logger.info(f"Handing off query: {query}")
+        return "Query escalated to human support. You'll be contacted soon."
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+CPU embedding backends for the sentence-transformers model.
+
+EMBEDDING_BACKEND selects how EMBEDDING_MODEL is run:
+
+- "torch" (default): HuggingFaceEmbeddings on PyTorch.
+- "onnx": an ONNX export of the same model, loaded from EMBEDDING_MODEL_PATH
+  with onnxruntime (optional: `pip install onnxruntime onnx`). Point the path
+  at `model.int8.onnx` for the dynamically quantized variant.
+
+Both backends tokenize, mean-pool and normalize the same way, so their vectors
+are interchangeable and existing FAISS indexes stay valid. EMBEDDING_THREADS
+caps the intra-op threads either backend uses (0 leaves the library default).
+
+Export once, from a machine that has the model cached, and check parity:
+
+    python -m src.data.embedding_backends export ./instance/models/minilm-onnx
+    python -m src.data.embedding_backends parity
+"""
+
+import argparse
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.config.settings import (
+    EMBEDDING_BACKEND, EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, EMBEDDING_MODEL_PATH, EMBEDDING_THREADS,
+)
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Minimum cosine similarity between a backend's vectors and the PyTorch reference
+PARITY_MIN_COSINE = 0.99
+
+EXPORT_CONFIG = "embedding_config.json"
+
+PARITY_TEXTS = [
+    "How do I reset my router?",
+    "The status light blinks red and the device shows error E404.",
+    "Order SKU-10423 arrived damaged, can I get a refund?",
+    "Hold the pairing button for five seconds until the speaker beeps twice.",
+    "Firmware updates are installed automatically overnight when the device is idle.",
+    "escalate",
+]
+
+
+class OnnxEmbeddings(Embeddings):
+    """Runs an exported sentence-transformers model with onnxruntime."""
+
+    def __init__(self, model_path: str, threads: int = 0, batch_size: int = 32):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires onnxruntime: pip install onnxruntime") from e
+        from tokenizers import Tokenizer
+
+        model_dir = os.path.dirname(model_path)
+        with open(os.path.join(model_dir, EXPORT_CONFIG)) as f:
+            self.config = json.load(f)
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"])
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+            weights = mask[..., None].astype(hidden.dtype)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            if self.config["normalize"]:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts):
+        # Same preprocessing as HuggingFaceEmbeddings
+        return self._embed([t.replace("\n", " ") for t in texts])
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def create_embeddings(backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        if EMBEDDING_THREADS:
+            import torch
+            torch.set_num_threads(EMBEDDING_THREADS)
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL, cache_folder=EMBEDDING_CACHE_DIR)
+    if backend == "onnx":
+        if not EMBEDDING_MODEL_PATH:
+            raise ValueError("EMBEDDING_BACKEND=onnx requires EMBEDDING_MODEL_PATH")
+        logger.info(f"Loading ONNX embedding model from {EMBEDDING_MODEL_PATH}")
+        return OnnxEmbeddings(EMBEDDING_MODEL_PATH, threads=EMBEDDING_THREADS)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+
+def export_onnx(out_dir: str, model_name: str = EMBEDDING_MODEL, cache_folder: Optional[str] = EMBEDDING_CACHE_DIR,
+                quantize: bool = True) -> List[str]:
+    """Export the sentence-transformers model to ONNX, plus an int8 copy if `quantize`; returns the model paths."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling, Transformer
+
+    model = SentenceTransformer(model_name, cache_folder=cache_folder, device="cpu")
+    transformer = next(m for m in model if isinstance(m, Transformer))
+    pooling = next(m for m in model if isinstance(m, Pooling))
+    if pooling.get_pooling_mode_str() != "mean":
+        raise ValueError(f"Only mean pooling is supported, {model_name} uses {pooling.get_pooling_mode_str()}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, EXPORT_CONFIG), "w") as f:
+        json.dump({
+            "source": model_name,
+            "max_seq_length": model.max_seq_length,
+            "pad_token_id": tokenizer.pad_token_id,
+            "normalize": any(isinstance(m, Normalize) for m in model),
+        }, f, indent=2)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    # Positional order of BertModel.forward
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer.auto_model.eval(),
+            tuple(sample[n] for n in input_names),
+            path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+    paths = [path]
+    logger.info(f"Exported {model_name} to {path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized = os.path.join(out_dir, "model.int8.onnx")
+        quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+        paths.append(quantized)
+        logger.info(f"Wrote int8 quantized model to {quantized}")
+    return paths
+
+
+def min_cosine(reference: Embeddings, candidate: Embeddings, texts: List[str] = PARITY_TEXTS) -> float:
+    """Lowest cosine similarity between the two backends' vectors for the same texts."""
+    a = np.array(reference.embed_documents(texts))
+    b = np.array(candidate.embed_documents(texts))
+    cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return float(cosines.min())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX and check backend parity.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Export EMBEDDING_MODEL to ONNX (fp32 and int8)")
+    export.add_argument("out_dir")
+    export.add_argument("--no-quantize", action="store_true")
+    commands.add_parser("parity", help="Compare EMBEDDING_MODEL_PATH against the PyTorch model")
+    args = parser.parse_args()
+    if args.command == "parity" and not EMBEDDING_MODEL_PATH:
+        parser.error("set EMBEDDING_MODEL_PATH to the exported .onnx model")
+
+    reference = create_embeddings("torch")
+    if args.command == "export":
+        paths = export_onnx(args.out_dir, quantize=not args.no_quantize)
+    else:
+        paths = [EMBEDDING_MODEL_PATH]
+    for path in paths:
+        cosine = min_cosine(reference, OnnxEmbeddings(path, threads=EMBEDDING_THREADS))
+        verdict = "ok" if cosine >= PARITY_MIN_COSINE else f"below {PARITY_MIN_COSINE}, do not use with existing indexes"
+        print(f"{path}: min cosine {cosine:.5f} ({verdict})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,248 @@
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from sqlalchemy.orm import Session
 import os
+import threading
 import time
-from filelock import FileLock
-from src.config.settings import EMBEDDING_MODEL, FAISS_INDEX_PATH
-from src.data.loader import load_documents_from_books
+from src.config.settings import FAISS_INDEX_PATH, RETRIEVAL_CANDIDATES, RETRIEVAL_K, RRF_K
+from src.data.embedding_backends import create_embeddings
+from src.data.index_store import LOAD_ERRORS, IndexReader, IndexStore, load_version
+from src.data.lexical import Segment, load_segments, reciprocal_rank_fusion
+from src.data.loader import load_book_documents
 from src.db.database import get_db
 from src.db.models import Book
 from src.utils.logger import setup_logger
+from src.utils.metrics import CACHE_HITS, EMBEDDING_SECONDS, LEXICAL_SECONDS, RETRIEVAL_SECONDS, RETRIEVAL_TOP_HIT
+from src.utils.tracing import span
 
 logger = setup_logger()
 
+_embeddings = None
+_embeddings_lock = threading.Lock()
+_index_store = None
+_index_reader = None
+_index_lock = threading.Lock()
+
+
+class TimedEmbeddings(Embeddings):
+    """Wraps an embeddings model so every call is recorded in the embedding histogram."""
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def embed_documents(self, texts):
+        with EMBEDDING_SECONDS.time(kind="documents"), span("embedding.documents", "embedding", count=len(texts)):
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        with EMBEDDING_SECONDS.time(kind="query"), span("embedding.query", "embedding"):
+            return self.inner.embed_query(text)
+
+
+def get_embeddings() -> Embeddings:
+    """Return the process-wide embeddings model, loading it on first use."""
+    global _embeddings
+    if _embeddings is not None:
+        CACHE_HITS.inc(cache="embeddings")
+        return _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            _embeddings = TimedEmbeddings(create_embeddings())
+    return _embeddings
+
+
+def get_index_store() -> IndexStore:
+    global _index_store
+    with _index_lock:
+        if _index_store is None:
+            _index_store = IndexStore(FAISS_INDEX_PATH)
+    return _index_store
+
+def get_index_reader() -> IndexReader:
+    global _index_reader
+    store = get_index_store()
+    with _index_lock:
+        if _index_reader is None:
+            _index_reader = IndexReader(store, get_embeddings)
+    return _index_reader
+
+def _index_is_current(manifest, books) -> bool:
+    if manifest is None:
+        return False
+    # Indexes adopted from the pre-manifest layout do not record their books
+    if manifest.get("book_ids") is not None and manifest["book_ids"] != sorted(book.id for book in books):
+        return False
+    return not any(os.path.getmtime(book.path) > manifest["created_at"] for book in books)
+
+def book_signature(book: Book) -> str:
+    """Changes whenever the book's file is replaced or modified."""
+    stat = os.stat(book.path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def _load_previous_version(store: IndexStore):
+    """The published vector store and its per-book segments, if they can be reused."""
+    manifest = store.read_manifest()
+    if not manifest or not manifest.get("version"):
+        return None, {}
+    path = store.version_path(manifest["version"])
+    try:
+        segments = load_segments(path)
+        if segments is None:
+            return None, {}
+        previous = load_version(path, get_embeddings())
+    except LOAD_ERRORS as e:
+        logger.warning(f"Cannot reuse FAISS index version {manifest['version']}: {e}")
+        return None, {}
+    return previous, {segment.book_id: segment for segment in segments}
+
+def _reuse_book(previous: FAISS, positions: dict, segment: Segment):
+    """Chunks and vectors of an unchanged book from the previous version, or None if any are missing."""
+    entries = []
+    for doc_id in segment.doc_ids:
+        position = positions.get(doc_id)
+        doc = previous.docstore.search(doc_id)
+        if position is None or not isinstance(doc, Document):
+            return None
+        entries.append((doc_id, doc.page_content, doc.metadata, previous.index.reconstruct(position).tolist()))
+    return entries
+
+def _build_indexes(store: IndexStore, books):
+    """
+    Build the FAISS index and BM25 segments for `books`.
+
+    Books whose file is unchanged since the published version keep their
+    chunks, vectors and segment; only new or modified books are parsed,
+    embedded and tokenized.
+    """
+    previous, previous_segments = _load_previous_version(store)
+    positions = {doc_id: position for position, doc_id in previous.index_to_docstore_id.items()} if previous else {}
+    segments, entries, new_docs = [], [], []
+    for book in books:
+        try:
+            signature = book_signature(book)
+            segment = previous_segments.get(book.id)
+            reused = _reuse_book(previous, positions, segment) if segment and segment.signature == signature else None
+            if reused is not None:
+                segments.append(segment)
+                entries.extend(reused)
+                logger.info(f"Reusing {len(reused)} indexed documents from unchanged book: {book.name}")
+                continue
+            docs = load_book_documents(book.path, book.id, book.name)
+        except Exception as e:
+            logger.error(f"Failed to load book {book.name}: {str(e)}")
+            continue
+        doc_ids = [f"{book.id}-{signature}-{i}" for i in range(len(docs))]
+        segments.append(Segment(book.id, signature, doc_ids, [doc.page_content for doc in docs]))
+        new_docs.extend(zip(doc_ids, docs))
+        logger.info(f"Loaded {len(docs)} documents from book: {book.name}")
+
+    if new_docs:
+        vectors = get_embeddings().embed_documents([doc.page_content for _, doc in new_docs])
+        entries.extend((doc_id, doc.page_content, doc.metadata, vector) for (doc_id, doc), vector in zip(new_docs, vectors))
+    if not entries:
+        return None, segments
+    with span("faiss.build", "retrieval", documents=len(entries), embedded=len(new_docs)):
+        vector_store = FAISS.from_embeddings(
+            [(text, vector) for _, text, _, vector in entries],
+            get_embeddings(),
+            metadatas=[metadata for _, _, metadata, _ in entries],
+            ids=[doc_id for doc_id, _, _, _ in entries],
+        )
+    return vector_store, segments
+
+def _current_vector_store():
+    with get_index_reader().acquire() as vector_store:
+        return vector_store
+
 def build_vector_store(db: Session, force_rebuild: bool = False):
-    index_path = os.path.join(FAISS_INDEX_PATH, "index.faiss")
-    last_modified = os.path.getmtime(index_path) if os.path.exists(index_path) else 0
+    """
+    Rebuild the FAISS index for the active books and publish it to every worker.
+
+    Only one process builds at a time; a non-forced call that finds an
+    up-to-date index (possibly published by another worker while it waited
+    for the lock) returns the current one instead.
+    """
+    store = get_index_store()
     books = db.query(Book).filter(Book.active == True).all()
-    books_modified = any(os.path.getmtime(book.path) > last_modified for book in books)
-    
-    if not force_rebuild and os.path.exists(index_path) and not books_modified:
+
+    if not force_rebuild and _index_is_current(store.read_manifest(), books):
         logger.info("FAISS index up-to-date, skipping rebuild")
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        return FAISS.load_local(FAISS_INDEX_PATH, embeddings=embeddings, allow_dangerous_deserialization=True)
-    
-    lock = FileLock(f"{FAISS_INDEX_PATH}/index.lock")
-    with lock:
-        logger.info("Rebuilding FAISS index for active books")
-        docs = load_documents_from_books(db)
-        if not docs:
-            logger.warning("No active books found for vector store")
-            return None
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        vector_store = FAISS.from_documents(docs, embedding=embeddings)
-        vector_store.save_local(FAISS_INDEX_PATH)
-        return vector_store
+        return _current_vector_store()
+
+    with store.lock():
+        store.adopt_legacy_index()
+        if not force_rebuild and _index_is_current(store.read_manifest(), books):
+            logger.info("FAISS index published by another worker, skipping rebuild")
+            vector_store = None
+        else:
+            logger.info("Rebuilding FAISS and BM25 indexes for active books")
+            vector_store, segments = _build_indexes(store, books)
+            if vector_store is None:
+                logger.warning("No active books found for vector store")
+                store.publish_empty()
+            else:
+                store.publish(vector_store, {s.book_id for s in segments if s.doc_ids}, segments)
+
+    # Serve the new version from this worker right away; others pick it up via their watcher
+    get_index_reader().refresh()
+    return vector_store if vector_store is not None else _current_vector_store()
+
+def hybrid_search(vector_store: FAISS, lexical, query: str, k: int = RETRIEVAL_K,
+                  candidates: int = RETRIEVAL_CANDIDATES):
+    """Fuse FAISS and BM25 rankings with RRF; returns (document, fused score) pairs, best first."""
+    with span("faiss.search", "retrieval"):
+        dense = [doc for doc, _ in vector_store.similarity_search_with_score(query, k=candidates)]
+    if lexical is None:
+        # Versions published before lexical search: keep the plain dense ranking
+        return [(doc, 1.0 / (RRF_K + rank)) for rank, doc in enumerate(dense[:k], start=1)]
+    with LEXICAL_SECONDS.time(), span("bm25.search", "retrieval"):
+        lexical_ids = [doc_id for doc_id, _ in lexical.search(query, k=candidates)]
+        exact = lexical.identifier_matches(query)
+    dense_ids = [doc.id for doc in dense]
+    # Chunks quoting a code from the query are a third ranking, in BM25 order
+    exact_ids = [doc_id for doc_id in lexical_ids if doc_id in exact]
+    fused = reciprocal_rank_fusion([dense_ids, lexical_ids, exact_ids])[:k]
+    if fused:
+        top = fused[0][0]
+        RETRIEVAL_TOP_HIT.inc(source="both" if top in dense_ids and top in lexical_ids else
+                              "dense" if top in dense_ids else "lexical")
+    by_id = {doc.id: doc for doc in dense}
+    results = []
+    for doc_id, score in fused:
+        doc = by_id.get(doc_id) or vector_store.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            results.append((doc, score))
+    return results
+
+def _wrap_retriever(reader: IndexReader):
+    def wrapped_retriever(query):
+        with reader.acquire_indexes() as (vector_store, lexical):
+            if vector_store is None:
+                return {"results": [], "used_book_ids": [], "book_ids": [], "scores": []}
+            with RETRIEVAL_SECONDS.time():
+                hits = hybrid_search(vector_store, lexical, query)
+        docs = [doc for doc, _ in hits]
+        used_book_ids = [doc.metadata.get("book_id") for doc in docs if doc.metadata.get("book_id")]
+        return {"results": [doc.page_content for doc in docs], "used_book_ids": used_book_ids,
+                "book_ids": [doc.metadata.get("book_id") for doc in docs], "scores": [score for _, score in hits]}
+    return wrapped_retriever
 
 def get_retriever(db: Session):
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-    try:
-        vector_store = FAISS.load_local(FAISS_INDEX_PATH, embeddings=embeddings, allow_dangerous_deserialization=True)
-        retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 2})
-        def wrapped_retriever(query):
-            docs = retriever.invoke(query)
-            used_book_ids = [doc.metadata.get("book_id") for doc in docs if doc.metadata.get("book_id")]
-            return {"results": [doc.page_content for doc in docs], "used_book_ids": used_book_ids}
-        return wrapped_retriever
-    except Exception as e:
-        logger.warning(f"FAISS index load failed: {e}, rebuilding...")
-        vector_store = build_vector_store(db, force_rebuild=True)
-        if vector_store:
-            retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 2})
-            def wrapped_retriever(query):
-                docs = retriever.invoke(query)
-                used_book_ids = [doc.metadata.get("book_id") for doc in docs if doc.metadata.get("book_id")]
-                return {"results": [doc.page_content for doc in docs], "used_book_ids": used_book_ids}
-            return wrapped_retriever
-        return None
\ No newline at end of file
+    store = get_index_store()
+    if store.read_manifest() is None:
+        # First start on this index directory: adopt an old index or build one
+        build_vector_store(db)
+    reader = get_index_reader()
+    with reader.acquire() as vector_store:
+        loaded = vector_store is not None
+    if not loaded and reader.failed_version is not None:
+        manifest = store.read_manifest()
+        if manifest and manifest.get("version") == reader.failed_version:
+            logger.warning(f"FAISS index version {reader.failed_version} failed to load, rebuilding")
+            build_vector_store(db, force_rebuild=True)
+            with reader.acquire() as vector_store:
+                loaded = vector_store is not None
+    if not loaded:
+        return None
+    return _wrap_retriever(reader)
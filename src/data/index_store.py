@@ -0,0 +1,319 @@
+"""
+Versioned FAISS index publication shared by all workers.
+
+One writer at a time (serialised by a FileLock) builds an index into a new,
+immutable directory under `versions/` and then atomically repoints
+`MANIFEST.json` at it. Readers memory-map the version named by the manifest,
+watch the manifest for changes and swap to the new version without
+disturbing queries already running on the old one.
+
+Each reader process holds a lease file for the version it has mapped.
+Versions that are neither current nor leased by a live process are deleted,
+always under the writer lock so collection never races a publish. A manifest
+with a null version means no books are active.
+
+    FAISS_INDEX_PATH/
+        MANIFEST.json             {"version": ..., "created_at": ..., "book_ids": [...]}
+        index.lock
+        versions/<version>/       index.faiss, index.pkl, lexical.pkl (BM25 segments)
+        leases/<version>/<pid>
+"""
+
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+
+import faiss
+from filelock import FileLock, Timeout
+from langchain_community.vectorstores import FAISS
+
+from src.config.settings import FAISS_INDEX_PATH, INDEX_WATCH_INTERVAL
+from src.data.lexical import LexicalIndex, Segment, load_lexical, save_segments
+from src.utils.logger import setup_logger
+from src.utils.metrics import CACHE_HITS, INDEX_REBUILDS
+from src.utils.tracing import span
+
+logger = setup_logger()
+
+MANIFEST = "MANIFEST.json"
+
+# What loading a missing, truncated or corrupt version directory raises
+LOAD_ERRORS = (OSError, RuntimeError, EOFError, pickle.UnpicklingError)
+
+
+class IndexStore:
+    def __init__(self, root: str = FAISS_INDEX_PATH):
+        self.root = root
+        self.versions_dir = os.path.join(root, "versions")
+        self.leases_dir = os.path.join(root, "leases")
+        self.manifest_path = os.path.join(root, MANIFEST)
+        os.makedirs(self.versions_dir, exist_ok=True)
+        os.makedirs(self.leases_dir, exist_ok=True)
+        self._lock = FileLock(os.path.join(root, "index.lock"))
+
+    def lock(self) -> FileLock:
+        return self._lock
+
+    def version_path(self, version: str) -> str:
+        return os.path.join(self.versions_dir, version)
+
+    def read_manifest(self) -> Optional[dict]:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def manifest_mtime(self) -> float:
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    # Writer side; callers must hold self.lock()
+
+    def publish(self, vector_store: FAISS, book_ids: Iterable[int], segments: Optional[List[Segment]] = None) -> str:
+        version = f"{time.time_ns()}-{uuid.uuid4().hex[:6]}"
+        staging = os.path.join(self.versions_dir, f".staging-{version}")
+        vector_store.save_local(staging)
+        if segments is not None:
+            save_segments(staging, segments)
+        os.replace(staging, self.version_path(version))
+        self._write_manifest({
+            "version": version,
+            "created_at": time.time(),
+            "book_ids": sorted(book_ids),
+            "documents": len(vector_store.index_to_docstore_id),
+        })
+        INDEX_REBUILDS.inc()
+        logger.info(f"Published FAISS index version {version}")
+        self.collect_garbage()
+        return version
+
+    def publish_empty(self):
+        self._write_manifest({"version": None, "created_at": time.time(), "book_ids": [], "documents": 0})
+        logger.info("Published empty FAISS index manifest, no active books")
+        self.collect_garbage()
+
+    def collect_garbage_if_idle(self):
+        """Collect unused versions unless a writer currently holds the lock."""
+        try:
+            with self._lock.acquire(timeout=0):
+                self.collect_garbage()
+        except Timeout:
+            pass
+
+    def adopt_legacy_index(self) -> Optional[str]:
+        """Publish an index saved directly in the root directory by older versions."""
+        legacy = os.path.join(self.root, "index.faiss")
+        if self.read_manifest() or not os.path.exists(legacy):
+            return None
+        version = f"{time.time_ns()}-legacy"
+        staging = os.path.join(self.versions_dir, f".staging-{version}")
+        os.makedirs(staging)
+        for name in ("index.faiss", "index.pkl"):
+            shutil.copy2(os.path.join(self.root, name), staging)
+        os.replace(staging, self.version_path(version))
+        self._write_manifest({"version": version, "created_at": os.path.getmtime(legacy), "book_ids": None})
+        logger.info(f"Adopted legacy FAISS index as version {version}")
+        return version
+
+    def _write_manifest(self, manifest: dict):
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+
+    # Leases
+
+    def acquire_lease(self, version: str):
+        lease_dir = os.path.join(self.leases_dir, version)
+        os.makedirs(lease_dir, exist_ok=True)
+        open(os.path.join(lease_dir, str(os.getpid())), "w").close()
+
+    def release_lease(self, version: str):
+        lease_dir = os.path.join(self.leases_dir, version)
+        try:
+            os.remove(os.path.join(lease_dir, str(os.getpid())))
+            os.rmdir(lease_dir)
+        except OSError:
+            pass
+
+    def _live_leases(self, version: str) -> list:
+        lease_dir = os.path.join(self.leases_dir, version)
+        try:
+            pids = os.listdir(lease_dir)
+        except FileNotFoundError:
+            return []
+        live = []
+        for pid in pids:
+            if _pid_alive(int(pid)):
+                live.append(pid)
+            else:
+                os.remove(os.path.join(lease_dir, pid))
+        return live
+
+    def collect_garbage(self):
+        """Delete versions nobody uses; callers must hold self.lock()."""
+        manifest = self.read_manifest()
+        current = manifest["version"] if manifest else None
+        for version in os.listdir(self.versions_dir):
+            if version == current or version.startswith(".staging-") or self._live_leases(version):
+                continue
+            shutil.rmtree(self.version_path(version), ignore_errors=True)
+            shutil.rmtree(os.path.join(self.leases_dir, version), ignore_errors=True)
+            logger.info(f"Removed unused FAISS index version {version}")
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill(pid, 0) would send CTRL_C_EVENT on Windows; treat leases as live until released
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def load_version(path: str, embeddings) -> FAISS:
+    """Load a saved index with its vectors memory-mapped instead of read into memory."""
+    index_file = os.path.join(path, "index.faiss")
+    try:
+        index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    except (RuntimeError, AttributeError):
+        index = faiss.read_index(index_file)
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+class _Handle:
+    def __init__(self, version: str, vector_store: FAISS, lexical: Optional[LexicalIndex]):
+        self.version = version
+        self.vector_store = vector_store
+        self.lexical = lexical
+        self.in_flight = 0
+        self.retired = False
+
+
+class IndexReader:
+    """Keeps the current index version mapped and hot-swaps it when the manifest changes."""
+
+    def __init__(self, store: IndexStore, embeddings_factory, watch_interval: float = INDEX_WATCH_INTERVAL):
+        self.store = store
+        self.embeddings_factory = embeddings_factory
+        self.watch_interval = watch_interval
+        self._handle: Optional[_Handle] = None
+        self._manifest_mtime = None
+        # Version named by the manifest that could not be loaded; callers rebuild it (see get_retriever)
+        self.failed_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    @contextmanager
+    def acquire(self):
+        """Yield the current vector store (or None) and keep it alive until the block exits."""
+        with self.acquire_indexes() as (vector_store, _):
+            yield vector_store
+
+    @contextmanager
+    def acquire_indexes(self):
+        """Like acquire(), but yield (vector store, lexical index); the lexical index is None for older versions."""
+        handle = self._current()
+        if handle is None:
+            yield None, None
+            return
+        try:
+            yield handle.vector_store, handle.lexical
+        finally:
+            self._release(handle)
+
+    def refresh(self):
+        """Swap to the manifest's version if it differs from the one mapped."""
+        with self._refresh_lock:
+            mtime = self.store.manifest_mtime()
+            if mtime == self._manifest_mtime:
+                return
+            manifest = self.store.read_manifest()
+            version = manifest["version"] if manifest else None
+            current = self._handle.version if self._handle else None
+            if version == current:
+                self._manifest_mtime = mtime
+                return
+            handle = None
+            if version is not None:
+                self.store.acquire_lease(version)
+                try:
+                    path = self.store.version_path(version)
+                    with span("faiss.load", "retrieval", version=version):
+                        handle = _Handle(version, load_version(path, self.embeddings_factory()), load_lexical(path))
+                except LOAD_ERRORS as e:
+                    # Either lost a race with a newer publish, which the next refresh picks up,
+                    # or the version is damaged and has to be rebuilt
+                    self.store.release_lease(version)
+                    self.failed_version = version
+                    logger.warning(f"Failed to load FAISS index version {version}: {e}")
+                    return
+            with self._lock:
+                old, self._handle = self._handle, handle
+                self._manifest_mtime = mtime
+                self.failed_version = None
+                drop_old = False
+                if old is not None:
+                    old.retired = True
+                    drop_old = old.in_flight == 0
+            logger.info(f"Now serving FAISS index version {version}")
+            if drop_old:
+                self._drop(old)
+
+    def _current(self) -> Optional[_Handle]:
+        if self._manifest_mtime is None:
+            self.refresh()
+            self._start_watcher()
+        else:
+            CACHE_HITS.inc(cache="index")
+        with self._lock:
+            handle = self._handle
+            if handle is not None:
+                handle.in_flight += 1
+        return handle
+
+    def _release(self, handle: _Handle):
+        with self._lock:
+            handle.in_flight -= 1
+            drop = handle.retired and handle.in_flight == 0
+        if drop:
+            self._drop(handle)
+
+    def _drop(self, handle: _Handle):
+        handle.vector_store = None
+        handle.lexical = None
+        self.store.release_lease(handle.version)
+        self.store.collect_garbage_if_idle()
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch, name="faiss-index-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"FAISS index watcher error: {e}")
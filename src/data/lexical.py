@@ -0,0 +1,162 @@
+"""
+In-process BM25 index over the same chunks as the FAISS index.
+
+Dense MiniLM similarity is weak on exact identifiers, so retrieval also runs
+a lexical search and fuses both rankings with reciprocal rank fusion (RRF).
+The tokenizer keeps product codes, SKUs and error numbers such as
+"SKU-10423" or "E404" whole and also indexes their alphabetic and numeric
+parts, so "sku 10423" still matches. Chunks containing an identifier from
+the query form a third ranking in the fusion, which keeps exact code
+matches on top even when the dense ranking has never seen the code.
+
+Postings are kept per book in a `Segment`, saved next to the FAISS files of
+each index version. A rebuild only tokenizes books whose file changed; the
+segments of unchanged books are carried over from the previous version.
+"""
+
+import math
+import os
+import pickle
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config.settings import RRF_K
+
+SEGMENTS_FILE = "lexical.pkl"
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it me my of on or so that the this "
+    "to was what when where which why will with you your".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_PART = re.compile(r"[a-z]+|[0-9]+")
+_DIGIT = re.compile(r"[0-9]")
+_LETTER = re.compile(r"[a-z]")
+# Bare numbers this long are order numbers or SKUs typed without their prefix, not quantities or years
+MIN_NUMERIC_ID_DIGITS = 5
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            # "sku-10423" -> "sku", "10423"; "e404" -> "404"
+            tokens.extend(part for part in parts if len(part) > 1 and part not in STOPWORDS)
+    return tokens
+
+
+def _is_identifier(token: str) -> bool:
+    if len(token) < 3 or not _DIGIT.search(token):
+        return False
+    # "sku-10423", "e404"; "2.4", "100" and "2024" are plain numbers
+    return bool(_LETTER.search(token)) or len(_DIGIT.findall(token)) >= MIN_NUMERIC_ID_DIGITS
+
+
+def identifiers(text: str) -> List[str]:
+    """Code-like tokens: product codes, SKUs, error and order numbers."""
+    return [token for token in _TOKEN.findall(text.lower()) if _is_identifier(token)]
+
+
+class Segment:
+    """Postings for the chunks of one book, keyed by their docstore ids."""
+
+    def __init__(self, book_id: int, signature: str, doc_ids: Sequence[str], texts: Sequence[str]):
+        self.book_id = book_id
+        # Identifies the file contents the segment was built from; see embeddings.book_signature
+        self.signature = signature
+        self.doc_ids = list(doc_ids)
+        self.lengths = []
+        postings = defaultdict(list)
+        for position, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((position, tf))
+        self.postings: Dict[str, List[Tuple[int, int]]] = dict(postings)
+
+
+class LexicalIndex:
+    """BM25 over all segments of one index version."""
+
+    def __init__(self, segments: Iterable[Segment], k1: float = 1.2, b: float = 0.75):
+        self.segments = {segment.book_id: segment for segment in segments}
+        self.doc_ids = [doc_id for segment in self.segments.values() for doc_id in segment.doc_ids]
+        self.doc_count = len(self.doc_ids)
+        total_length = sum(sum(s.lengths) for s in self.segments.values())
+        average_length = total_length / self.doc_count if self.doc_count else 1.0
+
+        # Merge once per version into per-term arrays of (chunk position, BM25 term weight without idf),
+        # so a query is a handful of vectorised adds over the postings of its own terms
+        positions, weights = defaultdict(list), defaultdict(list)
+        offset = 0
+        for segment in self.segments.values():
+            norms = [k1 * (1 - b + b * length / average_length) for length in segment.lengths]
+            for term, postings in segment.postings.items():
+                for p, tf in postings:
+                    positions[term].append(offset + p)
+                    weights[term].append(tf * (k1 + 1) / (tf + norms[p]))
+            offset += len(segment.doc_ids)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            term: (np.array(positions[term], dtype=np.int32), np.array(weights[term], dtype=np.float32))
+            for term in positions
+        }
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return up to `k` (docstore id, BM25 score) pairs, best first."""
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            positions, weights = postings
+            idf = math.log(1 + (self.doc_count - len(positions) + 0.5) / (len(positions) + 0.5))
+            scores[positions] += idf * weights
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.doc_ids[i], float(scores[i])) for i in matched]
+
+    def identifier_matches(self, query: str) -> set:
+        """Docstore ids of chunks containing any identifier from the query."""
+        matches = set()
+        for identifier in identifiers(query):
+            positions, _ = self._postings.get(identifier, ((), ()))
+            matches.update(self.doc_ids[i] for i in positions)
+        return matches
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def save_segments(directory: str, segments: Iterable[Segment]):
+    with open(os.path.join(directory, SEGMENTS_FILE), "wb") as f:
+        pickle.dump(list(segments), f)
+
+
+def load_segments(directory: str) -> Optional[List[Segment]]:
+    """Segments saved with an index version, or None for versions built before lexical search."""
+    try:
+        with open(os.path.join(directory, SEGMENTS_FILE), "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_lexical(directory: str) -> Optional[LexicalIndex]:
+    segments = load_segments(directory)
+    return LexicalIndex(segments) if segments is not None else None
@@ -15,6 +15,24 @@ from src.utils.logger import setup_logger
 
 logger = setup_logger()
 
+def load_book_documents(path: str, book_id: int, name: str):
+    """
+    Load one PDF and tag every page with its book.
+
+    Args:
+        path (str): Path of the PDF file.
+        book_id (int): ID of the book the PDF belongs to.
+        name (str): Book name, stored as the document source.
+
+    Returns:
+        List[Document]: One document per page.
+    """
+    docs = PyPDFLoader(path).load()
+    for doc in docs:
+        doc.metadata["book_id"] = book_id
+        doc.metadata["source"] = name
+    return docs
+
 def load_documents_from_books(db: Session):
     """
     Load documents from active books in the database, including book_id in metadata.
@@ -33,11 +51,7 @@ def load_documents_from_books(db: Session):
     documents = []
     for book in books:
         try:
-            loader = PyPDFLoader(book.path)
-            docs = loader.load()
-            for doc in docs:
-                doc.metadata["book_id"] = book.id
-                doc.metadata["source"] = book.name
+            docs = load_book_documents(book.path, book.id, book.name)
             documents.extend(docs)
             logger.info(f"Loaded {len(docs)} documents from book: {book.name}")
         except Exception as e:
@@ -1,13 +1,45 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
 from src.config.settings import DATABASE_URL
+from src.utils.metrics import DB_COMMIT_SECONDS
+from src.utils.tracing import current_trace
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread":False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+@event.listens_for(SessionLocal, "before_commit")
+def _start_commit_timer(session):
+    session.info["commit_started"] = time.perf_counter()
+
+@event.listens_for(SessionLocal, "after_commit")
+@event.listens_for(SessionLocal, "after_rollback")
+def _observe_commit(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_statement_span(conn, cursor, statement, parameters, context, executemany):
+    if current_trace() is not None:
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _record_statement_span(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace()
+    started = conn.info.get("statement_started")
+    if trace is not None and started:
+        trace.add_span("sql", "db", started.pop(), time.perf_counter(), threading.get_ident(), {"statement": statement[:200]})
+
+@event.listens_for(engine, "handle_error")
+def _discard_statement_span(exception_context):
+    if exception_context.connection is not None:
+        exception_context.connection.info.pop("statement_started", None)
+
 def get_db():
     db = SessionLocal()
 
@@ -0,0 +1,43 @@
+from sqlalchemy import inspect, text
+
+from src.db.database import SessionLocal, engine
+from src.db.models import ChatHistory, ChatSession
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+def migrate_schema():
+    """
+    Bring databases created before chat sessions existed up to date.
+
+    `Base.metadata.create_all` only creates missing tables, so the columns added
+    to `chat_histories` are added here, and existing messages are moved into one
+    session per user. Safe to run on every start.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("chat_histories")}
+    with engine.begin() as conn:
+        if "session_id" not in columns:
+            conn.execute(text("ALTER TABLE chat_histories ADD COLUMN session_id INTEGER REFERENCES chat_sessions(id)"))
+            logger.info("Added chat_histories.session_id")
+        if "created_at" not in columns:
+            conn.execute(text("ALTER TABLE chat_histories ADD COLUMN created_at TIMESTAMP"))
+            logger.info("Added chat_histories.created_at")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_chat_histories_session_id_id ON chat_histories (session_id, id)"
+        ))
+
+    db = SessionLocal()
+    try:
+        orphaned = db.query(ChatHistory.user_id).filter(ChatHistory.session_id.is_(None)).distinct().all()
+        for (user_id,) in orphaned:
+            session = ChatSession(user_id=user_id, title="Earlier conversation")
+            db.add(session)
+            db.flush()
+            db.query(ChatHistory).filter(
+                ChatHistory.user_id == user_id, ChatHistory.session_id.is_(None)
+            ).update({ChatHistory.session_id: session.id}, synchronize_session=False)
+        db.commit()
+        if orphaned:
+            logger.info(f"Moved chat history of {len(orphaned)} users into sessions")
+    finally:
+        db.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Text, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Text, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -12,18 +12,37 @@ class User(Base):
     hashed_password = Column(String)
     role = Column(String, default="user")
     chat_histories = relationship("ChatHistory", back_populates="user")
+    chat_sessions = relationship("ChatSession", back_populates="user")
     password_reset_token = relationship("PasswordResetToken", back_populates="user")
 
 
+class ChatSession(Base):
+    __tablename__ = "chat_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    title = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    archived_at = Column(DateTime(timezone=True), nullable=True, index=True) # set once messages moved to cold storage
+    archive_path = Column(String, nullable=True)
+    user = relationship("User", back_populates="chat_sessions")
+    messages = relationship("ChatHistory", back_populates="session")
+
+
 class ChatHistory(Base):
     __tablename__ = "chat_histories"
+    __table_args__ = (Index("ix_chat_histories_session_id_id", "session_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"))
     role = Column(String) # "user" or assistant
 
     content = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
     user = relationship("User", back_populates="chat_histories")
+    session = relationship("ChatSession", back_populates="messages")
 
 class Book(Base):
     __tablename__ = "books"
@@ -0,0 +1,134 @@
+"""
+Chat session compaction and retention.
+
+Sessions idle for longer than SESSION_ARCHIVE_AFTER_DAYS have their messages
+written to a gzipped JSON file under CHAT_ARCHIVE_DIR and deleted from
+`chat_histories`, which keeps the hot table small. Archived sessions older
+than CHAT_RETENTION_DAYS are deleted entirely (0 keeps them forever).
+
+Runs periodically inside the API (see `run_compaction`), or from cron:
+
+    python -m src.db.retention
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from filelock import FileLock, Timeout
+from sqlalchemy.orm import Session
+
+from src.config.settings import CHAT_ARCHIVE_DIR, CHAT_RETENTION_DAYS, SESSION_ARCHIVE_AFTER_DAYS
+from src.db.database import SessionLocal
+from src.db.models import BookUsage, ChatHistory, ChatSession
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+def _write_archive(path: str, session: ChatSession, messages: list):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "session_id": session.id,
+        "user_id": session.user_id,
+        "title": session.title,
+        "created_at": session.created_at.isoformat() if session.created_at else None,
+        "messages": [
+            {
+                "id": m.id,
+                "role": m.role,
+                "content": m.content,
+                "created_at": m.created_at.isoformat() if m.created_at else None,
+            }
+            for m in messages
+        ],
+    }
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def load_archive(session: ChatSession) -> list:
+    """Return the messages of an archived session, as stored by `compact_sessions`."""
+    if not session.archive_path or not os.path.exists(session.archive_path):
+        return []
+    with gzip.open(session.archive_path, "rt", encoding="utf-8") as f:
+        return json.load(f)["messages"]
+
+
+def compact_sessions(
+    db: Session,
+    archive_dir: str = CHAT_ARCHIVE_DIR,
+    archive_after_days: float = SESSION_ARCHIVE_AFTER_DAYS,
+    retention_days: float = CHAT_RETENTION_DAYS,
+    now: Optional[datetime] = None,
+    batch_size: int = 100,
+) -> dict:
+    now = now or datetime.utcnow()
+    archived = deleted = 0
+
+    idle_cutoff = now - timedelta(days=archive_after_days)
+    while True:
+        sessions = db.query(ChatSession).filter(
+            ChatSession.archived_at.is_(None), ChatSession.updated_at < idle_cutoff
+        ).order_by(ChatSession.id).limit(batch_size).all()
+        if not sessions:
+            break
+        for session in sessions:
+            messages = db.query(ChatHistory).filter(ChatHistory.session_id == session.id).order_by(ChatHistory.id).all()
+            path = os.path.join(archive_dir, str(session.user_id), f"{session.id}.json.gz")
+            # A /chat that committed since the SELECTs above has bumped updated_at; leave that session alone,
+            # otherwise its new messages would stay in the hot table under an archived session
+            claimed = db.query(ChatSession).filter(
+                ChatSession.id == session.id, ChatSession.archived_at.is_(None), ChatSession.updated_at < idle_cutoff
+            ).update({ChatSession.archived_at: now, ChatSession.archive_path: path}, synchronize_session="fetch")
+            if not claimed:
+                logger.info(f"Session {session.id} was used during compaction, not archiving it")
+                continue
+            _write_archive(path, session, messages)
+            message_ids = [m.id for m in messages]
+            if message_ids:
+                # Keep usage analytics; the messages they pointed at now live in the archive
+                db.query(BookUsage).filter(BookUsage.chat_id.in_(message_ids)).update(
+                    {BookUsage.chat_id: None}, synchronize_session=False)
+                db.query(ChatHistory).filter(ChatHistory.id.in_(message_ids)).delete(synchronize_session=False)
+            archived += 1
+        db.commit()
+
+    if retention_days:
+        expiry_cutoff = now - timedelta(days=retention_days)
+        expired = db.query(ChatSession).filter(ChatSession.archived_at < expiry_cutoff).all()
+        for session in expired:
+            if session.archive_path:
+                try:
+                    os.remove(session.archive_path)
+                except FileNotFoundError:
+                    pass
+            db.delete(session)
+            deleted += 1
+        db.commit()
+
+    if archived or deleted:
+        logger.info(f"Chat compaction archived {archived} sessions, deleted {deleted} expired sessions")
+    return {"archived": archived, "deleted": deleted}
+
+
+def run_compaction() -> Optional[dict]:
+    """Compact with a fresh DB session; skipped if another worker is already compacting."""
+    os.makedirs(CHAT_ARCHIVE_DIR, exist_ok=True)
+    try:
+        with FileLock(os.path.join(CHAT_ARCHIVE_DIR, "compaction.lock")).acquire(timeout=0):
+            db = SessionLocal()
+            try:
+                return compact_sessions(db)
+            finally:
+                db.close()
+    except Timeout:
+        return None
+
+
+if __name__ == "__main__":
+    print(run_compaction())
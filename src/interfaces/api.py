@@ -1,22 +1,33 @@
+import asyncio
 import json
 import logging
-from typing import List
+from typing import List, Optional
 from fastapi import FastAPI, Depends, HTTPException, Request, UploadFile, File, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy import func
 from sqlalchemy.orm import Session
+from src.core.context import refresh_book_names
 from src.core.graph import build_graph
+from src.core.llm_gateway import LLMOverloaded, current_llm_user
 from src.core.memory import AgentState
-from src.db.models import BookUsage, User, ChatHistory, Book, PasswordResetToken, UserActivity
+from src.db.models import BookUsage, User, ChatHistory, ChatSession, Book, PasswordResetToken, UserActivity
 from src.db.database import get_db, Base, engine
+from src.db.migrations import migrate_schema
+from src.db.retention import load_archive, run_compaction
 from src.interfaces.auth import verify_password, get_password_hash, create_access_token, get_current_user, get_current_admin
 from src.data.embeddings import build_vector_store
 from langchain_core.messages import HumanMessage, AIMessage
 from datetime import datetime, timedelta
 import os
 import secrets
-from src.config.settings import BOOKS_UPLOAD_DIR
+from src.config.settings import BOOKS_UPLOAD_DIR, CHAT_COMPACTION_INTERVAL
+from src.utils.metrics import REGISTRY, CONTENT_TYPE, REQUEST_SECONDS
+from src.utils.tracing import start_trace, finish_trace
+import threading
+import time
 
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -46,7 +57,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw URL, to keep series cardinality bounded
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    trace = start_trace(f"{request.method} {request.url.path}", request.headers)
+    if trace is None:
+        return await call_next(request)
+    # The request span belongs to the event loop thread, not the pool thread that writes the trace
+    tid = threading.get_ident()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace.id
+        return response
+    finally:
+        # Stopping the profiler joins its thread and the export writes files, so keep both off the loop
+        await run_in_threadpool(finish_trace, trace, tid, status=status)
+
 Base.metadata.create_all(bind=engine)
+migrate_schema()
+
+async def compact_chat_history_periodically():
+    while True:
+        await asyncio.sleep(CHAT_COMPACTION_INTERVAL)
+        try:
+            await run_in_threadpool(run_compaction)
+        except Exception as e:
+            logger.error(f"Chat compaction failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_chat_compaction():
+    if CHAT_COMPACTION_INTERVAL > 0:
+        # Keep a reference so the task is not garbage collected
+        app.state.chat_compaction = asyncio.create_task(compact_chat_history_periodically())
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
 
 class UserCreate(BaseModel):
     username: str
@@ -68,6 +133,10 @@ class PasswrodReset(BaseModel):
 
 class ChatRequest(BaseModel):
     user_input: str
+    session_id: Optional[int] = None # defaults to the user's most recent open session
+
+class ChatSessionCreate(BaseModel):
+    title: Optional[str] = None
 
 class BookToggle(BaseModel):
     id: int
@@ -173,14 +242,77 @@ async def password_reset(req: PasswrodReset, db: Session = Depends(get_db)):
     return {"message": "Password reset successful"}
 
 
-@app.get("/chat")
-async def get_chat_history(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    logger.debug(f"Fetching chat history for user {current_user.username}")
-    history = [
+def serialize_session(session: ChatSession):
+    return {
+        "id": session.id,
+        "title": session.title,
+        "created_at": session.created_at,
+        "updated_at": session.updated_at,
+        "archived": session.archived_at is not None,
+    }
+
+def session_history(db: Session, session: ChatSession):
+    if session.archived_at is not None:
+        return [{"role": m["role"], "content": m["content"]} for m in load_archive(session)]
+    return [
         {"role": ch.role, "content": ch.content}
-        for ch in db.query(ChatHistory).filter(ChatHistory.user_id == current_user.id).order_by(ChatHistory.id).all()
+        for ch in db.query(ChatHistory).filter(ChatHistory.session_id == session.id).order_by(ChatHistory.id).all()
     ]
-    return {"chat_history": history}
+
+def get_user_session(db: Session, user: User, session_id: int) -> ChatSession:
+    session = db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == user.id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return session
+
+def create_session(db: Session, user: User, title: Optional[str] = None) -> ChatSession:
+    # Set in Python so it orders correctly against updated_at values written by /chat
+    now = datetime.utcnow()
+    session = ChatSession(user_id=user.id, title=title, created_at=now, updated_at=now)
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+def claim_session(db: Session, session: ChatSession) -> bool:
+    """Bump the session's updated_at unless compaction archived it meanwhile; False if it did."""
+    claimed = db.query(ChatSession).filter(ChatSession.id == session.id, ChatSession.archived_at.is_(None)).update(
+        {ChatSession.updated_at: datetime.utcnow()}, synchronize_session="evaluate")
+    return claimed == 1
+
+def latest_open_session(db: Session, user: User) -> Optional[ChatSession]:
+    return db.query(ChatSession).filter(
+        ChatSession.user_id == user.id, ChatSession.archived_at.is_(None)
+    ).order_by(ChatSession.updated_at.desc(), ChatSession.id.desc()).first()
+
+
+@app.get("/chat/sessions")
+async def list_chat_sessions(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    logger.debug(f"Listing chat sessions for user {current_user.username}")
+    sessions = db.query(ChatSession).filter(ChatSession.user_id == current_user.id).order_by(ChatSession.updated_at.desc()).all()
+    return [serialize_session(s) for s in sessions]
+
+@app.post("/chat/sessions")
+async def create_chat_session(
+    request: ChatSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    session = create_session(db, current_user, request.title)
+    logger.debug(f"Chat session {session.id} created for user {current_user.username}")
+    return serialize_session(session)
+
+@app.get("/chat")
+async def get_chat_history(
+    session_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    logger.debug(f"Fetching chat history for user {current_user.username}, session {session_id}")
+    session = get_user_session(db, current_user, session_id) if session_id is not None else latest_open_session(db, current_user)
+    if session is None:
+        return {"session_id": None, "chat_history": []}
+    return {"session_id": session.id, "chat_history": session_history(db, session)}
 
 @app.post("/chat")
 async def chat(
@@ -188,29 +320,46 @@ async def chat(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    if request.session_id is not None:
+        session = get_user_session(db, current_user, request.session_id)
+        if session.archived_at is not None:
+            raise HTTPException(status_code=409, detail="Chat session is archived, start a new one")
+    else:
+        session = latest_open_session(db, current_user)
+        if session is None:
+            session = create_session(db, current_user)
     try:
-        logger.debug(f"Chat request from user {current_user.username}: {request.user_input}")
+        logger.debug(f"Chat request from user {current_user.username} in session {session.id}: {request.user_input}")
         history = [
             HumanMessage(content=ch.content) if ch.role == "user" else AIMessage(content=ch.content)
-            for ch in db.query(ChatHistory).filter(ChatHistory.user_id == current_user.id).order_by(ChatHistory.id.desc()).limit(5).all()
+            for ch in db.query(ChatHistory).filter(ChatHistory.session_id == session.id).order_by(ChatHistory.id.desc()).limit(5).all()
         ]
         history = list(reversed(history))
         graph = build_graph(db)
         state = AgentState(input=request.user_input, chat_history=history, output="", user_id=current_user.id)
-        result = graph.invoke(state)
-        chat_id = db.query(ChatHistory).count() + 1
-        db.add(ChatHistory(user_id=current_user.id, role="user", content=request.user_input))
-        db.add(ChatHistory(user_id=current_user.id, role="assistant", content=result["output"]))
+        current_llm_user.set(str(current_user.id))
+        # Run the blocking graph off the event loop so other requests keep being served
+        result = await run_in_threadpool(graph.invoke, state)
+        if not claim_session(db, session):
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Chat session was archived, start a new one")
+        db.add(ChatHistory(user_id=current_user.id, session_id=session.id, role="user", content=request.user_input))
+        answer = ChatHistory(user_id=current_user.id, session_id=session.id, role="assistant", content=result["output"])
+        db.add(answer)
         db.add(UserActivity(user_id=current_user.id, action="chat"))
+        if not session.title:
+            session.title = request.user_input[:60]
+        db.flush()
         used_book_ids = result.get("used_book_ids", [])
         for book_id in used_book_ids:
-            db.add(BookUsage(book_id=book_id, chat_id=chat_id))
+            db.add(BookUsage(book_id=book_id, chat_id=answer.id))
         db.commit()
-        serialized_history = [
-            {"role": ch.role, "content": ch.content}
-            for ch in db.query(ChatHistory).filter(ChatHistory.user_id == current_user.id).order_by(ChatHistory.id).all()
-        ]
-        return {"response": result["output"], "chat_history": serialized_history}
+        return {"response": result["output"], "session_id": session.id, "chat_history": session_history(db, session)}
+    except HTTPException:
+        raise
+    except LLMOverloaded as e:
+        logger.warning(f"Chat shed for user {current_user.username}: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -249,6 +398,7 @@ async def upload_book(
         uploaded_books.append(file.filename)
     db.commit()
     # db.refresh(db_book)
+    refresh_book_names(db)
     
     build_vector_store(db, force_rebuild=True)
     logger.debug(f"Books '{uploaded_books}' uploaded and FAISS index rebuilt")
@@ -280,6 +430,7 @@ async def toggle_book(toggle: BookToggle, current_admin: User = Depends(get_curr
         raise HTTPException(status_code=404, detail="Book not found")
     book.active = toggle.active
     db.commit()
+    refresh_book_names(db)
     
     build_vector_store(db, force_rebuild=True)
     logger.debug(f"Book '{book.name}' toggled to {'active' if toggle.active else 'inactive'}, FAISS index rebuilt")
@@ -314,6 +465,7 @@ async def delete_book(delete: BookDelete, current_admin: User = Depends(get_curr
 
     db.delete(book)
     db.commit()
+    refresh_book_names(db)
     build_vector_store(db, force_rebuild=True)
 
     logger.debug(f"Book '{book.name}' deleted and FAISS index rebuilt")
@@ -0,0 +1,205 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Observations are a bisect plus a few integer increments under a lock, and
+nothing is formatted until `/metrics` is scraped, so instrumented code pays
+close to nothing when nobody is collecting.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_request_seconds", "HTTP request latency.", ["method", "path", "status"]))
+GRAPH_NODE_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_graph_node_seconds", "LangGraph node latency.", ["node"]))
+RETRIEVAL_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_retrieval_seconds", "Knowledge base retrieval latency, including the query embedding."))
+LEXICAL_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_lexical_search_seconds", "BM25 search latency.",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)))
+RETRIEVAL_TOP_HIT = REGISTRY.register(Counter(
+    "chatbot_retrieval_top_hit", "Which retriever ranked the fused top result (dense, lexical or both).", ["source"]))
+EMBEDDING_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_embedding_seconds", "Embedding model call latency.", ["kind"]))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_llm_seconds", "LLM call latency."))
+DB_COMMIT_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_db_commit_seconds", "Database commit latency."))
+TOOL_CALLS = REGISTRY.register(Counter(
+    "chatbot_tool_calls", "Agent tool invocations.", ["tool"]))
+CACHE_HITS = REGISTRY.register(Counter(
+    "chatbot_cache_hits", "In-process cache hits.", ["cache"]))
+INDEX_REBUILDS = REGISTRY.register(Counter(
+    "chatbot_index_rebuilds", "FAISS index rebuilds."))
+LLM_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "chatbot_llm_queue_seconds", "Time spent waiting for an LLM gateway slot."))
+LLM_REJECTED = REGISTRY.register(Counter(
+    "chatbot_llm_rejected", "LLM calls shed by the gateway.", ["reason"]))
+LLM_COALESCED = REGISTRY.register(Counter(
+    "chatbot_llm_coalesced", "LLM calls served by an identical call already in flight."))
+LLM_RETRIES = REGISTRY.register(Counter(
+    "chatbot_llm_retries", "LLM call retries after retryable upstream errors."))
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Times LLM calls and counts tool invocations made by the agent."""
+
+    def __init__(self):
+        self._llm_starts: Dict[object, float] = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._llm_starts[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._llm_starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._observe_llm(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._observe_llm(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        TOOL_CALLS.inc(tool=(serialized or {}).get("name") or kwargs.get("name") or "unknown")
+
+    def _observe_llm(self, run_id):
+        start = self._llm_starts.pop(run_id, None)
+        if start is not None:
+            LLM_SECONDS.observe(time.perf_counter() - start)
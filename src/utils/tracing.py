@@ -0,0 +1,204 @@
+"""
+Opt-in per-request tracing and sampling profiler.
+
+A trace is attached to the request through a context variable, so spans
+opened anywhere below it (graph nodes, tools, embeddings, SQL statements)
+land in the same trace without threading it through call signatures. When no
+trace is active `span()` costs one context variable lookup.
+
+Traces are written as Chrome trace JSON (open in chrome://tracing or
+Perfetto); profiles as collapsed stacks (speedscope, flamegraph.pl). Only the
+newest TRACE_MAX_FILES traces are kept. The X-Trace / X-Profile request
+headers are ignored unless TRACE_HEADER_ENABLED is set.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from src.config.settings import (
+    PROFILE_INTERVAL, PROFILE_SAMPLE_RATE, TRACE_DIR, TRACE_HEADER_ENABLED, TRACE_MAX_FILES, TRACE_SAMPLE_RATE,
+)
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+TRACE_HEADER = "x-trace"
+PROFILE_HEADER = "x-profile"
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.profiler: Optional[SamplingProfiler] = None
+        # Threads currently inside a span; the profiler only samples these
+        self.active_threads = Counter()
+        self._lock = threading.Lock()
+
+    def _us(self, t: float) -> float:
+        return (t - self.started) * 1e6
+
+    def add_span(self, name: str, category: str, start: float, end: float, tid: int, args: dict):
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self._us(start),
+            "dur": (end - start) * 1e6,
+            "pid": self.pid,
+            "tid": tid,
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def enter_thread(self, tid: int):
+        with self._lock:
+            self.active_threads[tid] += 1
+
+    def exit_thread(self, tid: int):
+        with self._lock:
+            self.active_threads[tid] -= 1
+            if self.active_threads[tid] <= 0:
+                del self.active_threads[tid]
+
+    def export(self, directory: Optional[str] = None) -> str:
+        directory = directory or TRACE_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.id}.trace.json")
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"name": self.name}}, f)
+        if self.profiler:
+            self.profiler.export(os.path.join(directory, f"{self.id}.folded"))
+        prune_traces(directory)
+        return path
+
+
+def prune_traces(directory: str, max_files: Optional[int] = None):
+    """Delete all but the newest `max_files` traces in `directory`, with their profiles."""
+    max_files = TRACE_MAX_FILES if max_files is None else max_files
+    if not max_files:
+        return
+    traces = [entry for entry in os.scandir(directory) if entry.name.endswith(".trace.json")]
+    if len(traces) <= max_files:
+        return
+    traces.sort(key=_mtime)
+    for entry in traces[:-max_files]:
+        trace_id = entry.name[:-len(".trace.json")]
+        for path in (entry.path, os.path.join(directory, f"{trace_id}.folded")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker pruned it first
+                pass
+
+
+def _mtime(entry: os.DirEntry) -> float:
+    try:
+        return entry.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads that are inside a span of the given trace."""
+
+    def __init__(self, trace: Trace, interval: float = PROFILE_INTERVAL):
+        self.trace = trace
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{trace.id[:8]}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            threads = list(self.trace.active_threads)
+            frames = sys._current_frames()
+            for tid in threads:
+                frame = frames.get(tid)
+                if frame is not None:
+                    self.stacks[_collapse(frame)] += 1
+
+    def export(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def _header_enabled(headers, name: str) -> bool:
+    return TRACE_HEADER_ENABLED and headers.get(name, "").lower() in ("1", "true", "yes")
+
+
+def start_trace(name: str, headers) -> Optional[Trace]:
+    """Start a trace for this request if it was asked for by header or picked by sampling."""
+    profile = _header_enabled(headers, PROFILE_HEADER) or random.random() < PROFILE_SAMPLE_RATE
+    if not (profile or _header_enabled(headers, TRACE_HEADER) or random.random() < TRACE_SAMPLE_RATE):
+        return None
+    trace = Trace(name)
+    if profile:
+        trace.profiler = SamplingProfiler(trace)
+        trace.profiler.start()
+    _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace: Trace, tid: int, **args) -> str:
+    if trace.profiler:
+        trace.profiler.stop()
+    trace.add_span(trace.name, "request", trace.started, time.perf_counter(), tid, args)
+    _current_trace.set(None)
+    path = trace.export()
+    logger.info(f"Trace {trace.id} written to {path}")
+    return path
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, category: str = "app", **args):
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    tid = threading.get_ident()
+    trace.enter_thread(tid)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, category, start, time.perf_counter(), tid, args)
+        trace.exit_thread(tid)
@@ -0,0 +1,62 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import src.core.context as context
+from src.core.context import estimate_tokens, get_book_names, pack_context, refresh_book_names
+from src.db.database import Base
+from src.db.models import Book
+
+NAMES = {1: "router.pdf", 2: "speaker.pdf"}
+
+RESET = ("To reset the router, hold the power button for ten seconds until the light blinks. "
+         "Then wait two minutes for the router to restart and reconnect.")
+PAIR = "To pair the speaker, open the companion app and choose the device from the list."
+
+
+def test_near_duplicates_are_dropped_and_best_chunk_comes_first():
+    hits = [
+        (PAIR, 2, 0.02),
+        (RESET, 1, 0.03),
+        # Same page extracted twice with different line breaks
+        (RESET.replace(". ", ".\n"), 1, 0.025),
+    ]
+    packed = pack_context(hits, NAMES, token_budget=500)
+    assert packed["content"] == f"[router.pdf]\n{RESET}\n\n[speaker.pdf]\n{PAIR}"
+    assert packed["used_book_ids"] == [1, 2]
+
+
+def test_budget_is_filled_by_score_and_cut_at_a_sentence():
+    hits = [(RESET, 1, 0.03), (PAIR, 2, 0.02)]
+    packed = pack_context(hits, NAMES, token_budget=30)
+    assert estimate_tokens(packed["content"]) <= 30
+    assert packed["content"] == "[router.pdf]\nTo reset the router, hold the power button for ten seconds until the light blinks."
+    assert packed["used_book_ids"] == [1]
+
+
+def test_empty_retrieval():
+    assert pack_context([], NAMES)["used_book_ids"] == []
+
+
+def test_book_names_are_cached_until_an_unknown_book_appears(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Book(id=1, name="router.pdf", path="router.pdf"))
+    db.commit()
+    monkeypatch.setattr(context, "_book_names", None)
+
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    assert get_book_names(db, {1}) == {1: "router.pdf"}
+    assert get_book_names(db, {1}) == {1: "router.pdf"}
+    assert len(queries) == 1
+
+    db.add(Book(id=2, name="speaker.pdf", path="speaker.pdf"))
+    db.commit()
+    queries.clear()
+    assert get_book_names(db, {1, 2})[2] == "speaker.pdf"
+    assert len(queries) == 1
+
+    db.query(Book).filter(Book.id == 2).delete()
+    db.commit()
+    assert 2 not in refresh_book_names(db)
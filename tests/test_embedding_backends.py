@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from src.config.settings import EMBEDDING_MODEL_PATH
+from src.data.embedding_backends import PARITY_MIN_COSINE, OnnxEmbeddings, create_embeddings, export_onnx, min_cosine
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+WORDS = "how do i reset my router the light is blinking red error code pair speaker order refund sku".split()
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A small randomly initialised BERT sentence-transformer, built offline with the same module layout as MiniLM."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling, Transformer
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    base = tmp_path_factory.mktemp("tiny-bert")
+    characters = "abcdefghijklmnopqrstuvwxyz0123456789-?"
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS + list(characters) + [f"##{c}" for c in characters]
+    (base / "vocab.txt").write_text("\n".join(dict.fromkeys(vocab)))
+    BertTokenizerFast(str(base / "vocab.txt")).save_pretrained(base)
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(dict.fromkeys(vocab)), hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=2, intermediate_size=64, max_position_embeddings=64)
+    BertModel(config).save_pretrained(base)
+
+    transformer = Transformer(str(base), max_seq_length=64)
+    model = SentenceTransformer(modules=[transformer, Pooling(32, "mean"), Normalize()], device="cpu")
+    path = tmp_path_factory.mktemp("tiny-st")
+    model.save(str(path))
+    return str(path)
+
+
+def test_onnx_export_matches_torch(tiny_model, tmp_path):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    fp32, int8 = export_onnx(str(tmp_path), model_name=tiny_model, cache_folder=None)
+    reference = HuggingFaceEmbeddings(model_name=tiny_model)
+    texts = ["how do i reset my router", "the light is blinking red\nerror code e404", "order sku-10423 refund?"]
+
+    assert min_cosine(reference, OnnxEmbeddings(fp32, threads=1), texts) > 0.9999
+    assert min_cosine(reference, OnnxEmbeddings(int8, threads=1), texts) >= PARITY_MIN_COSINE
+
+    onnx = OnnxEmbeddings(fp32, batch_size=2)
+    assert onnx.embed_query(texts[0]) == pytest.approx(onnx.embed_documents(texts)[0], abs=1e-5)
+
+
+@pytest.mark.skipif(not EMBEDDING_MODEL_PATH or not os.path.exists(EMBEDDING_MODEL_PATH or ""),
+                    reason="EMBEDDING_MODEL_PATH does not point at an exported model")
+def test_configured_model_matches_torch():
+    # Needs the PyTorch model cached too (HF_HUB_OFFLINE=1 EMBEDDING_CACHE_DIR=...)
+    assert min_cosine(create_embeddings("torch"), OnnxEmbeddings(EMBEDDING_MODEL_PATH)) >= PARITY_MIN_COSINE
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import src.core.graph as graph
+import src.interfaces.api as api
+from src.db.database import Base
+from src.db.models import Book, BookUsage, ChatHistory, User
+from src.interfaces.auth import get_current_user
+
+
+def test_chat_records_usage_of_the_books_the_retriever_returned(tmp_path, monkeypatch):
+    @tool
+    def faq_retriever_tool(query: str) -> dict:
+        """Retrieve relevant FAQs from the knowledge base."""
+        return {"content": "[router.pdf]\nHold the button.", "used_book_ids": [2, 1, 2]}
+
+    def plan(inputs):
+        # First call the retriever, then answer from what it returned
+        if not inputs["intermediate_steps"]:
+            return AgentAction("faq_retriever_tool", {"query": inputs["input"]}, "")
+        return AgentFinish({"output": "Hold the button."}, "")
+
+    monkeypatch.setattr(graph, "get_agent", lambda db: RunnableLambda(plan))
+    monkeypatch.setattr(graph, "make_faq_retriever_tool", lambda db: faq_retriever_tool)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(username="dave", hashed_password="x")
+    db.add_all([user, Book(id=1, name="router.pdf", path="router.pdf"), Book(id=2, name="speaker.pdf", path="speaker.pdf")])
+    db.commit()
+    monkeypatch.setitem(api.app.dependency_overrides, api.get_db, lambda: db)
+    monkeypatch.setitem(api.app.dependency_overrides, get_current_user, lambda: user)
+
+    response = TestClient(api.app).post("/chat", json={"user_input": "reset router?"})
+
+    assert response.status_code == 200
+    assert response.json()["response"] == "Hold the button."
+    answer = db.query(ChatHistory).filter(ChatHistory.role == "assistant").one()
+    usage = db.query(BookUsage).order_by(BookUsage.id).all()
+    assert [(u.book_id, u.chat_id) for u in usage] == [(2, answer.id), (1, answer.id)]
@@ -0,0 +1,83 @@
+import os
+import shutil
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import src.data.embeddings as embeddings_module
+from loadtest.corpus import generate_corpus
+from src.data.index_store import IndexReader, IndexStore
+from src.db.database import Base
+from src.db.models import Book
+
+embeddings = DeterministicFakeEmbedding(size=8)
+
+
+def publish(store, texts, book_id):
+    vector_store = FAISS.from_texts(texts, embeddings, metadatas=[{"book_id": book_id}] * len(texts))
+    with store.lock():
+        return store.publish(vector_store, [book_id])
+
+
+def test_reader_hot_swaps_without_dropping_in_flight_queries(tmp_path):
+    store = IndexStore(str(tmp_path))
+    reader = IndexReader(store, lambda: embeddings, watch_interval=3600)
+    v1 = publish(store, ["how to reset the router"], 1)
+
+    with reader.acquire() as old:
+        assert old.similarity_search("reset", k=1)[0].metadata["book_id"] == 1
+        v2 = publish(store, ["how to pair the speaker"], 2)
+        reader.refresh()
+
+        # The old version stays on disk and usable while a query holds it
+        assert os.path.isdir(store.version_path(v1))
+        assert old.similarity_search("reset", k=1)[0].metadata["book_id"] == 1
+        with reader.acquire() as new:
+            assert new.similarity_search("pair", k=1)[0].metadata["book_id"] == 2
+
+    assert not os.path.exists(store.version_path(v1))
+    assert os.path.isdir(store.version_path(v2))
+
+
+def test_empty_manifest_serves_nothing(tmp_path):
+    store = IndexStore(str(tmp_path))
+    reader = IndexReader(store, lambda: embeddings, watch_interval=3600)
+    v1 = publish(store, ["how to reset the router"], 1)
+    with reader.acquire() as vector_store:
+        assert vector_store is not None
+
+    with store.lock():
+        store.publish_empty()
+    reader.refresh()
+
+    with reader.acquire() as vector_store:
+        assert vector_store is None
+    assert not os.path.exists(store.version_path(v1))
+
+
+def test_retriever_rebuilds_a_version_that_fails_to_load(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for path in generate_corpus(str(tmp_path / "books"), books=1, pages=2, seed=1):
+        db.add(Book(name=os.path.basename(path), path=path, active=True))
+    db.commit()
+    store = IndexStore(str(tmp_path / "index"))
+    monkeypatch.setattr(embeddings_module, "_embeddings", embeddings)
+    monkeypatch.setattr(embeddings_module, "_index_store", store)
+    monkeypatch.setattr(embeddings_module, "_index_reader", IndexReader(store, lambda: embeddings, watch_interval=3600))
+    embeddings_module.build_vector_store(db, force_rebuild=True)
+    broken = store.read_manifest()["version"]
+
+    # Lose the published version and start a worker that has never loaded it
+    shutil.rmtree(store.version_path(broken))
+    reader = IndexReader(store, lambda: embeddings, watch_interval=3600)
+    monkeypatch.setattr(embeddings_module, "_index_reader", reader)
+
+    retriever = embeddings_module.get_retriever(db)
+    assert retriever is not None
+    assert store.read_manifest()["version"] != broken
+    assert reader.failed_version is None
+    assert retriever("reset the router")["results"]
@@ -0,0 +1,91 @@
+import re
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import src.data.embeddings as embeddings_module
+from loadtest.corpus import generate_corpus
+from src.data.index_store import IndexReader, IndexStore
+from src.data.lexical import LexicalIndex, Segment, identifiers, reciprocal_rank_fusion, tokenize
+from src.db.database import Base
+from src.db.models import Book
+
+
+def test_tokenizer_keeps_codes_and_their_parts():
+    tokens = tokenize("Order SKU-10423 shows error E404. How do I reset it?")
+    assert "sku-10423" in tokens and "sku" in tokens and "10423" in tokens
+    assert "e404" in tokens and "404" in tokens
+    assert "reset" in tokens and "how" not in tokens
+
+
+def test_identifiers_are_codes_not_plain_numbers():
+    assert identifiers("SKU-10423 shows E404, order 10423") == ["sku-10423", "e404", "10423"]
+    assert identifiers("Runs at 2.4 GHz, 100 times faster since 2024") == []
+
+
+def test_bm25_ranks_exact_code_first():
+    segment = Segment(1, "sig", ["a", "b", "c"], [
+        "To reset the router hold the button. Error E101 means no signal.",
+        "To reset the camera hold the button. Error E404 means the lens is blocked.",
+        "Router SKU-55555 ships with a power adapter.",
+    ])
+    index = LexicalIndex([segment])
+    assert index.search("what does error E404 mean", k=1)[0][0] == "b"
+    assert index.search("sku 55555", k=1)[0][0] == "c"
+    assert index.search("nothing relevant here", k=3) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]], k=60)
+    assert [doc_id for doc_id, _ in fused][:2] == ["y", "x"]
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def index_env(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    embeddings = CountingEmbeddings(size=16)
+    store = IndexStore(str(tmp_path / "index"))
+    monkeypatch.setattr(embeddings_module, "_embeddings", embeddings)
+    monkeypatch.setattr(embeddings_module, "_index_store", store)
+    monkeypatch.setattr(embeddings_module, "_index_reader", IndexReader(store, lambda: embeddings, watch_interval=3600))
+    return db, embeddings, tmp_path
+
+
+def add_books(db, paths):
+    for path in paths:
+        db.add(Book(name=path.rsplit("/", 1)[-1], path=path, active=True))
+    db.commit()
+
+
+def test_rebuild_embeds_only_changed_books_and_finds_codes(index_env):
+    db, embeddings, tmp_path = index_env
+    add_books(db, generate_corpus(str(tmp_path / "a"), books=2, pages=3, seed=1, prefix="first"))
+    embeddings_module.build_vector_store(db, force_rebuild=True)
+    assert embeddings.embedded == 6
+
+    add_books(db, generate_corpus(str(tmp_path / "b"), books=1, pages=3, seed=2, prefix="second"))
+    embeddings_module.build_vector_store(db, force_rebuild=True)
+    # Only the new book's pages were embedded again
+    assert embeddings.embedded == 9
+
+    retriever = embeddings_module.get_retriever(db)
+    with embeddings_module.get_index_reader().acquire() as vector_store:
+        pages = [doc.page_content for doc in vector_store.docstore._dict.values()]
+    assert len(pages) == 9
+    for page in pages:
+        sku = re.search(r"SKU-\d{5}", page).group()
+        result = retriever(f"question about {sku}")
+        assert sku in result["results"][0]
+        assert result["scores"] == sorted(result["scores"], reverse=True)
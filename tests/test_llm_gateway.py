@@ -0,0 +1,109 @@
+import threading
+import time
+
+import groq
+import httpx
+import pytest
+
+from src.core.llm_gateway import LLMGateway, LLMOverloaded
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://llm.test"))
+    return groq.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_identical_in_flight_calls_are_coalesced():
+    gateway = LLMGateway(max_in_flight=4)
+    calls = []
+    started = threading.Event()
+
+    def upstream():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {"text": "answer"}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(gateway.call("u1", "same-prompt", upstream)))
+    leader.start()
+    started.wait()
+    results.append(gateway.call("u2", "same-prompt", upstream))
+    leader.join()
+
+    assert len(calls) == 1
+    assert results == [{"text": "answer"}, {"text": "answer"}]
+
+
+def test_waiting_users_are_served_round_robin():
+    gateway = LLMGateway(max_in_flight=1, queue_timeout=5)
+    gateway.acquire("busy")
+    order = []
+
+    def worker(user):
+        gateway.acquire(user)
+        order.append(user)
+        gateway.release()
+
+    threads = []
+    for user in ["a", "a", "a", "b"]:
+        thread = threading.Thread(target=worker, args=(user,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)
+    gateway.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_overload_is_shed_fast():
+    gateway = LLMGateway(max_in_flight=1, max_queue=0)
+    gateway.acquire("u1")
+    with pytest.raises(LLMOverloaded):
+        gateway.acquire("u2")
+
+    gateway = LLMGateway(max_in_flight=1, queue_timeout=0.05)
+    gateway.acquire("u1")
+    with pytest.raises(LLMOverloaded):
+        gateway.acquire("u2")
+
+
+def test_rate_limits_are_retried_then_shed():
+    gateway = LLMGateway(max_retries=2, backoff_base=0.001, backoff_max=0.001)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise rate_limit_error()
+        return "ok"
+
+    assert gateway.call("u1", None, flaky) == "ok"
+    assert len(attempts) == 3
+
+    def always_limited():
+        raise rate_limit_error()
+
+    with pytest.raises(LLMOverloaded):
+        gateway.call("u1", None, always_limited)
+    assert gateway.in_flight == 0
+
+
+def test_long_retry_after_is_shed_without_sleeping():
+    gateway = LLMGateway(max_in_flight=1, max_retries=1, queue_timeout=0.5, backoff_max=0.01)
+    attempts = []
+
+    def limited():
+        attempts.append(1)
+        raise rate_limit_error(retry_after=3)
+
+    start = time.perf_counter()
+    with pytest.raises(LLMOverloaded) as shed:
+        gateway.call("u1", None, limited)
+    assert time.perf_counter() - start < 0.1
+    assert shed.value.retry_after == 3
+    assert len(attempts) == 1
+    assert gateway.in_flight == 0
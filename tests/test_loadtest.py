@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from loadtest import fake_llm
+from loadtest.driver import compare, percentile, summarize
+
+TOOLS = [{"type": "function", "function": {"name": "faq_retriever_tool", "parameters": {}}}]
+
+
+def test_percentile_is_nearest_rank():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 5.0
+    assert percentile(values, 0) == 1.0
+    assert percentile([], 99) == 0.0
+
+
+def test_summarize_counts_errors_by_status():
+    samples = [
+        {"endpoint": "/chat", "status": 200, "seconds": 0.1, "error": None},
+        {"endpoint": "/chat", "status": 200, "seconds": 0.3, "error": None},
+        {"endpoint": "/chat", "status": 429, "seconds": 0.2, "error": "shed"},
+        {"endpoint": "/chat", "status": 0, "seconds": 0.4, "error": "connect timeout"},
+    ]
+    summary = summarize(samples, duration=2.0)
+    assert summary["requests"] == 4
+    assert summary["errors"] == 2
+    assert summary["error_rate"] == 0.5
+    assert summary["errors_by_status"] == {"429": 1, "transport": 1}
+    assert summary["throughput_rps"] == 2.0
+    assert summary["latency_ms"]["p50"] == pytest.approx(200)
+    assert summary["latency_ms"]["max"] == pytest.approx(400)
+    assert summarize([], duration=0)["error_rate"] == 0.0
+
+
+def test_compare_reports_relative_change():
+    def report(rps, error_rate, p50):
+        latency = {"p50": p50, "p95": p50 * 2, "p99": 0.0}
+        return {"commit": "abc1234", "chat": {"throughput_rps": rps, "error_rate": error_rate, "latency_ms": latency}}
+
+    delta = compare(report(12.0, 0.05, 150.0), report(10.0, 0.0, 200.0))
+    assert delta["baseline_commit"] == "abc1234"
+    assert delta["throughput_rps"] == pytest.approx(0.2)
+    assert delta["error_rate"] == pytest.approx(0.05)
+    assert delta["latency_p50"] == pytest.approx(-0.25)
+    assert delta["latency_p95"] == pytest.approx(-0.25)
+    # No baseline to compare against
+    assert delta["latency_p99"] is None
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setattr(fake_llm.app.state, "latency_ms", 0.0)
+    monkeypatch.setattr(fake_llm.app.state, "tokens_per_second", 1e6)
+    return TestClient(fake_llm.app)
+
+
+def test_fake_llm_calls_the_retriever_then_answers(llm):
+    messages = [{"role": "user", "content": "How do I reset my router?"}]
+    first = llm.post("/openai/v1/chat/completions", json={"messages": messages, "tools": TOOLS}).json()
+    choice = first["choices"][0]
+    assert choice["finish_reason"] == "tool_calls"
+    call = choice["message"]["tool_calls"][0]
+    assert call["function"]["name"] == "faq_retriever_tool"
+    assert json.loads(call["function"]["arguments"]) == {"query": "How do I reset my router?"}
+
+    messages += [choice["message"], {"role": "tool", "tool_call_id": call["id"], "content": "Hold the button."}]
+    second = llm.post("/v1/chat/completions", json={"messages": messages, "tools": TOOLS}).json()
+    choice = second["choices"][0]
+    assert choice["finish_reason"] == "stop"
+    assert choice["message"]["content"].startswith("Synthetic answer to 'How do I reset my router?'")
+    assert second["usage"]["completion_tokens"] == fake_llm.app.state.completion_tokens
+
+
+def test_fake_llm_streams_chunks_then_done(llm):
+    body = {"messages": [{"role": "user", "content": "hi"}], "stream": True}
+    with llm.stream("POST", "/v1/chat/completions", json=body) as response:
+        events = [line[len("data: "):] for line in response.iter_lines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    text = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+    assert text.startswith("Synthetic answer to 'hi'")
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+    assert "usage" in chunks[-1]["x_groq"]
@@ -0,0 +1,32 @@
+from src.utils.metrics import Counter, Histogram, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.register(Histogram("test_seconds", "Test latency.", ["node"], buckets=(0.1, 1.0)))
+    hist.observe(0.05, node="agent")
+    hist.observe(0.1, node="agent")
+    hist.observe(5, node="agent")
+
+    text = registry.render()
+
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{node="agent",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{node="agent",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{node="agent",le="+Inf"} 3' in text
+    assert 'test_seconds_count{node="agent"} 3' in text
+
+
+def test_counter_requires_declared_labels():
+    counter = Counter("test_calls", "Test calls.", ["tool"])
+    counter.inc(tool="faq_retriever_tool")
+    counter.inc(tool="faq_retriever_tool")
+
+    assert counter.value(tool="faq_retriever_tool") == 2
+    assert 'test_calls_total{tool="faq_retriever_tool"} 2' in counter.render()
+    try:
+        counter.inc(other="x")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError for unknown label")
@@ -0,0 +1,136 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.db.database import Base
+from src.db.models import Book, BookUsage, ChatHistory, ChatSession, User
+from src.db.retention import compact_sessions, load_archive
+
+NOW = datetime(2025, 6, 1)
+
+
+def make_db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def add_session(db, user, updated_at, messages):
+    session = ChatSession(user_id=user.id, title=messages[0], updated_at=updated_at)
+    db.add(session)
+    db.flush()
+    rows = [ChatHistory(user_id=user.id, session_id=session.id, role=role, content=text)
+            for role, text in zip(["user", "assistant"] * len(messages), messages)]
+    db.add_all(rows)
+    db.flush()
+    return session, rows
+
+
+def test_idle_sessions_are_archived_and_removed_from_hot_table(tmp_path):
+    db = make_db()
+    user = User(username="alice", hashed_password="x")
+    book = Book(name="manual.pdf", path="manual.pdf", active=True)
+    db.add_all([user, book])
+    db.flush()
+    idle, idle_rows = add_session(db, user, NOW - timedelta(days=40), ["reset router?", "Hold the button."])
+    recent, _ = add_session(db, user, NOW - timedelta(days=1), ["pair speaker?", "Press pair."])
+    db.add(BookUsage(book_id=book.id, chat_id=idle_rows[1].id))
+    db.commit()
+
+    result = compact_sessions(db, archive_dir=str(tmp_path), archive_after_days=30, retention_days=365, now=NOW)
+
+    assert result == {"archived": 1, "deleted": 0}
+    assert db.query(ChatHistory).filter(ChatHistory.session_id == idle.id).count() == 0
+    assert db.query(ChatHistory).filter(ChatHistory.session_id == recent.id).count() == 2
+    assert idle.archived_at == NOW and recent.archived_at is None
+    assert [m["content"] for m in load_archive(idle)] == ["reset router?", "Hold the button."]
+    # Usage analytics survive compaction
+    assert db.query(BookUsage).one().chat_id is None
+
+
+def test_expired_archives_are_deleted(tmp_path):
+    db = make_db()
+    user = User(username="bob", hashed_password="x")
+    db.add(user)
+    db.flush()
+    session, _ = add_session(db, user, NOW - timedelta(days=500), ["hello?", "Hi."])
+    db.commit()
+
+    compact_sessions(db, archive_dir=str(tmp_path), archive_after_days=30, retention_days=0, now=NOW - timedelta(days=400))
+    path = session.archive_path
+    assert os.path.exists(path)
+
+    # Retention of 0 keeps archives forever
+    assert compact_sessions(db, archive_dir=str(tmp_path), archive_after_days=30, retention_days=0, now=NOW)["deleted"] == 0
+
+    assert compact_sessions(db, archive_dir=str(tmp_path), archive_after_days=30, retention_days=365, now=NOW) == {"archived": 0, "deleted": 1}
+    assert not os.path.exists(path)
+    assert db.query(ChatSession).count() == 0
+
+
+def test_session_chatted_in_during_compaction_is_not_archived(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    make_session = sessionmaker(bind=engine)
+    db = make_session()
+    user = User(username="erin", hashed_password="x")
+    db.add(user)
+    db.flush()
+    session, _ = add_session(db, user, NOW - timedelta(days=40), ["reset router?", "Hold the button."])
+    db.commit()
+    session_id, user_id = session.id, user.id
+
+    chatted = []
+
+    def chat_before_first_write(conn, cursor, statement, *args):
+        # Compaction has read the idle session and its messages by then
+        if not chatted and not statement.startswith("SELECT"):
+            chatted.append(statement)
+            # What /chat commits when it claims the session and saves a turn
+            other = make_session()
+            other.query(ChatSession).filter(ChatSession.id == session_id).update({ChatSession.updated_at: NOW})
+            other.add(ChatHistory(user_id=user_id, session_id=session_id, role="user", content="still blinking"))
+            other.commit()
+
+    event.listen(engine, "before_cursor_execute", chat_before_first_write)
+    result = compact_sessions(db, archive_dir=str(tmp_path), archive_after_days=30, retention_days=0, now=NOW)
+
+    assert result == {"archived": 0, "deleted": 0}
+    check = make_session()
+    assert check.get(ChatSession, session_id).archived_at is None
+    assert check.query(ChatHistory).filter(ChatHistory.session_id == session_id).count() == 3
+    assert not os.path.exists(tmp_path / str(user_id))
+
+
+def test_chat_is_not_saved_to_a_session_archived_while_the_llm_ran(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import src.interfaces.api as api
+    from src.interfaces.auth import get_current_user
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    make_session = sessionmaker(bind=engine)
+    db = make_session()
+    user = User(username="carol", hashed_password="x")
+    db.add(user)
+    db.flush()
+    session, _ = add_session(db, user, NOW - timedelta(days=40), ["reset router?", "Hold the button."])
+    db.commit()
+
+    class ArchivingGraph:
+        def invoke(self, state):
+            # The compactor runs in another worker while the request waits on the LLM
+            compact_sessions(make_session(), archive_dir=str(tmp_path), archive_after_days=30, retention_days=0, now=NOW)
+            return {"output": "Unplug it.", "used_book_ids": []}
+
+    monkeypatch.setattr(api, "build_graph", lambda db: ArchivingGraph())
+    monkeypatch.setitem(api.app.dependency_overrides, api.get_db, lambda: db)
+    monkeypatch.setitem(api.app.dependency_overrides, get_current_user, lambda: user)
+
+    response = TestClient(api.app).post("/chat", json={"user_input": "still blinking", "session_id": session.id})
+
+    assert response.status_code == 409
+    assert make_session().query(ChatHistory).count() == 0
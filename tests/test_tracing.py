@@ -0,0 +1,54 @@
+import json
+import os
+
+from src.utils import tracing
+
+
+def test_span_is_noop_without_trace():
+    with tracing.span("idle"):
+        pass
+    assert tracing.current_trace() is None
+
+
+def test_trace_headers_are_ignored_unless_enabled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_HEADER_ENABLED", False)
+    assert tracing.start_trace("POST /chat", {"x-trace": "1", "x-profile": "1"}) is None
+
+
+def test_trace_header_records_spans_and_exports_chrome_trace(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_HEADER_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    trace = tracing.start_trace("POST /chat", {"x-trace": "1"})
+    with tracing.span("node.agent", "graph"):
+        with tracing.span("tool.faq_retriever_tool", "tool", query="reset"):
+            pass
+    tracing.finish_trace(trace, 0, status=200)
+
+    data = json.loads((tmp_path / f"{trace.id}.trace.json").read_text())
+    names = [event["name"] for event in data["traceEvents"]]
+    assert names == ["tool.faq_retriever_tool", "node.agent", "POST /chat"]
+    assert tracing.current_trace() is None
+
+
+def test_middleware_writes_the_trace_before_responding(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from src.interfaces.api import app
+
+    monkeypatch.setattr(tracing, "TRACE_HEADER_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    response = TestClient(app).get("/metrics", headers={"x-trace": "1"})
+
+    data = json.loads((tmp_path / f"{response.headers['X-Trace-Id']}.trace.json").read_text())
+    request_span = data["traceEvents"][-1]
+    assert request_span["name"] == "GET /metrics"
+    assert request_span["args"] == {"status": 200}
+
+
+def test_only_the_newest_traces_are_kept(tmp_path):
+    for i in range(4):
+        (tmp_path / f"t{i}.trace.json").write_text("{}")
+        (tmp_path / f"t{i}.folded").write_text("")
+        os.utime(tmp_path / f"t{i}.trace.json", (1000 + i, 1000 + i))
+    tracing.prune_traces(str(tmp_path), max_files=2)
+    assert sorted(os.listdir(tmp_path)) == ["t2.folded", "t2.trace.json", "t3.folded", "t3.trace.json"]